@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
 
 import sys
+import os
 import getopt
 import glob
 import csv
 from collections import Counter
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+import presence
+
 def usage(f=sys.stderr):
     program = sys.argv[0]
     f.write(f"""\
@@ -16,9 +20,12 @@ With no FILE, or when FILE is -, read standard input. By default, print results
   -h, --help            show this help
   -o, --out             write to file
   -b, --binary          read input as binary (default: False)
+  -s, --store=PREFIX    count days from the presence store at PREFIX (see ../data/presence.py)
+                        instead of reading files
 
 Example:
   {program} < input.txt > output.csv
+  {program} --store ../data/gfw-presence > output.csv
 """)
 
 def eprint(*args, **kwargs):
@@ -40,7 +47,7 @@ def input_files(args, binary=False):
 
 if __name__ == '__main__':
     try:
-        opts, args = getopt.gnu_getopt(sys.argv[1:], "ho:b", ["help", "out=", "binary"])
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "ho:bs:", ["help", "out=", "binary", "store="])
     except getopt.GetoptError as err:
         eprint(err)
         usage()
@@ -48,6 +55,7 @@ if __name__ == '__main__':
 
     output_file = sys.stdout
     binary_input = False
+    store_prefix = None
     for o, a in opts:
         if o in ("-h", "--help"):
             usage()
@@ -56,6 +64,18 @@ if __name__ == '__main__':
             output_file = open(a, 'a+')
         if o in ("-b", "--binary"):
             binary_input = True
+        if o in ("-s", "--store"):
+            store_prefix = a
+
+    if store_prefix:
+        # Each domain's count is the popcount of its column in the store.
+        store = presence.PresenceStore(store_prefix)
+        writer = csv.writer(output_file)
+        writer.writerow(["domain", "count"])
+        for domain, count in zip(store.domains, store.days_present()):
+            writer.writerow([domain, count])
+        output_file.close()
+        sys.exit(0)
 
     # Use a counter to keep track of each domain's frequency.
     counter = Counter()
@@ -1,17 +1,22 @@
 #!/usr/bin/env python3
 
 import sys
+import os
 import getopt
 import glob
 import json
 import csv
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data"))
+import churnlog
+
 def usage(f=sys.stderr):
     program = sys.argv[0]
     f.write(f"""\
 Usage: {program} [OPTIONS] [DOMAIN_FILE...]
 This script reads a list of domains from files or stdin and two churn JSON files.
 It outputs a CSV with columns: domain,gfw_added,gfw_removed,henan_added,henan_removed.
+Churn files ending in .churn are read as binary churn logs (see ../../data/churnlog.py).
 
 Options:
   -h, --help            show this help
@@ -41,6 +46,30 @@ def input_files(args, binary=False):
                     with open(path, MODE) as f:
                         yield f
 
+def first_dates(churn_file_path, binary=False):
+    """
+    Return two dicts mapping each domain to the first date it was added
+    and removed on.
+    """
+    if churn_file_path.endswith(".churn"):
+        log = churnlog.ChurnLog(churn_file_path)
+        dates = [str(d) for d in log.dates]
+        added, removed = {}, {}
+        for first, out in zip(log.first_dates(), (added, removed)):
+            for i in (first >= 0).nonzero()[0]:
+                out[log.domains[i]] = dates[first[i]]
+        return added, removed
+
+    added, removed = {}, {}
+    for date, data in load_churn_file(churn_file_path, binary=binary).items():
+        for domain in data.get("domain_added", []):
+            if domain not in added:
+                added[domain] = date
+        for domain in data.get("domain_removed", []):
+            if domain not in removed:
+                removed[domain] = date
+    return added, removed
+
 def load_churn_file(churn_file_path, binary=False):
     mode = 'rb' if binary else 'r'
     with open(churn_file_path, mode) as f:
@@ -80,43 +109,19 @@ if __name__ == '__main__':
         usage()
         sys.exit(1)
 
-    # Load churn JSON files.
+    # Load churn files and build lookup dictionaries.
     try:
-        churn_gfw_data = load_churn_file(churn_gfw_path, binary=binary_input)
+        gfw_added, gfw_removed = first_dates(churn_gfw_path, binary=binary_input)
     except Exception as e:
         eprint("Error loading churn-gfw file:", e)
         sys.exit(1)
 
     try:
-        churn_henan_data = load_churn_file(churn_henan_path, binary=binary_input)
+        henan_added, henan_removed = first_dates(churn_henan_path, binary=binary_input)
     except Exception as e:
         eprint("Error loading churn-henan file:", e)
         sys.exit(1)
 
-    # Build lookup dictionaries for each churn file.
-    gfw_added = {}
-    gfw_removed = {}
-    henan_added = {}
-    henan_removed = {}
-
-    # Process GFW churn data.
-    for date, data in churn_gfw_data.items():
-        for domain in data.get("domain_added", []):
-            if domain not in gfw_added:
-                gfw_added[domain] = date
-        for domain in data.get("domain_removed", []):
-            if domain not in gfw_removed:
-                gfw_removed[domain] = date
-
-    # Process Henan churn data.
-    for date, data in churn_henan_data.items():
-        for domain in data.get("domain_added", []):
-            if domain not in henan_added:
-                henan_added[domain] = date
-        for domain in data.get("domain_removed", []):
-            if domain not in henan_removed:
-                henan_removed[domain] = date
-
     # Read domain list from input files or stdin.
     domains = []
     for f in input_files(args, binary=binary_input):
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import getopt
+import csv
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+import presence
+
+# Domains are processed this many at a time when extracting runs, so that
+# only one block of the unpacked matrix is transposed and diffed at once.
+BLOCK_DOMAINS = 16384
+
+def usage(f=sys.stderr):
+    program = sys.argv[0]
+    f.write(f"""\
+Usage: {program} --store PREFIX [OPTIONS]
+This script builds an index of the censorship intervals of every domain in a presence store
+(see ../data/presence.py) and answers queries against it. An interval is a run of consecutive
+snapshots in which the domain was censored; it starts at the first and ends at the last snapshot
+date of the run. The index is cached in PREFIX-intervals.npz and rebuilt when a file of the store
+changes size or mtime.
+
+  -h, --help            show this help
+  -o, --out             write to file (default: stdout)
+  -s, --store=PREFIX    the presence store to index (required)
+  -d, --domain=DOMAIN   print the censorship intervals of DOMAIN as CSV: start, end, days
+  --on=DATE             print the domains censored on DATE, or with --domain, whether DOMAIN was
+  --during=DATE,DATE    print the domains censored at any time between the two dates (inclusive)
+  --longest             print the longest continuous run of every domain as CSV: domain, start, end, days
+  --durations           print the number of days every domain was censored as CSV: domain, count
+  --fewer-than=N        print the domains censored for fewer than N days
+
+Example:
+  {program} --store ../data/henan-presence --fewer-than 21 > henan-domains-censored-less-than-21-days.txt
+  {program} --store ../data/gfw-presence --domain youtube.com --on 2024-01-01
+""")
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+def index_path(prefix):
+    return prefix + "-intervals.npz"
+
+def store_key(prefix):
+    """
+    Return the (size, mtime) of every file of the store at prefix, to tell
+    whether a cached index is still current.
+    """
+    key = []
+    for path in (presence.bits_path(prefix), presence.domains_path(prefix), presence.dates_path(prefix)):
+        st = os.stat(path)
+        key.extend((st.st_size, st.st_mtime_ns))
+    return np.array(key, dtype=np.int64)
+
+class IntervalIndex:
+    """
+    The censorship intervals of every domain of one presence store.
+
+    Runs are kept in CSR form: the runs of domain ID i are
+    starts[offsets[i]:offsets[i+1]] (and the same slice of ends and
+    lengths), sorted by start. starts and ends are datetime64[D]; lengths
+    count snapshots.
+    """
+
+    def __init__(self, store, offsets, starts, ends, lengths):
+        self.store = store
+        self.domains = store.domains
+        self.offsets = offsets
+        self.starts = starts
+        self.ends = ends
+        self.lengths = lengths
+        self.run_domain = np.repeat(np.arange(len(self.domains)), np.diff(offsets))
+        # Plain integer day numbers compare faster than datetime64.
+        self._start_days = starts.view(np.int64)
+        self._end_days = ends.view(np.int64)
+
+    @classmethod
+    def from_store(cls, store):
+        dates = np.array(store.dates, dtype="datetime64[D]")
+        rows = store.rows()
+        starts, ends, counts = [], [], []
+        for block in range(0, len(store.domains), BLOCK_DOMAINS):
+            m = rows[:, block:block + BLOCK_DOMAINS].T.astype(np.int8)
+            padded = np.zeros((m.shape[0], m.shape[1] + 2), dtype=np.int8)
+            padded[:, 1:-1] = m
+            edges = np.diff(padded, axis=1)
+            # np.nonzero walks row-major, so both lists are sorted by
+            # (domain, day) and the i-th rise pairs with the i-th fall.
+            rise_domain, rise = np.nonzero(edges == 1)
+            _, fall = np.nonzero(edges == -1)
+            starts.append(rise)
+            ends.append(fall)
+            counts.append(np.bincount(rise_domain, minlength=m.shape[0]))
+        rise = np.concatenate(starts)
+        fall = np.concatenate(ends)
+        offsets = np.concatenate([[0], np.cumsum(np.concatenate(counts))])
+        return cls(store, offsets, dates[rise], dates[fall - 1], (fall - rise).astype(np.int32))
+
+    @classmethod
+    def open(cls, prefix):
+        """
+        Load the index of the store at prefix, rebuilding the cached copy
+        if it is missing or out of date.
+        """
+        key = store_key(prefix)
+        store = presence.PresenceStore(prefix)
+        path = index_path(prefix)
+        if os.path.exists(path):
+            with np.load(path) as npz:
+                # An index made before the key was stored is out of date.
+                if "store_key" in npz and np.array_equal(npz["store_key"], key):
+                    return cls(store, npz["offsets"], npz["starts"], npz["ends"], npz["lengths"])
+        index = cls.from_store(store)
+        np.savez(path, store_key=key, offsets=index.offsets,
+                 starts=index.starts, ends=index.ends, lengths=index.lengths)
+        return index
+
+    def runs(self, domain):
+        """
+        Return the (start, end, days) runs of domain, or [] if it was never
+        censored.
+        """
+        i = self.store.domain_id(domain)
+        if i is None:
+            return []
+        a, b = self.offsets[i], self.offsets[i + 1]
+        return list(zip(self.starts[a:b], self.ends[a:b], self.lengths[a:b]))
+
+    def blocked_on(self, domain, day):
+        """
+        Return whether domain was censored on day. Days between two
+        snapshots of the same run count as censored.
+        """
+        i = self.store.domain_id(domain)
+        if i is None:
+            return False
+        a, b = self.offsets[i], self.offsets[i + 1]
+        k = a + np.searchsorted(self.starts[a:b], np.datetime64(day, "D"), side="right") - 1
+        return bool(k >= a and self.ends[k] >= np.datetime64(day, "D"))
+
+    def blocked_during(self, first, last):
+        """
+        Return the IDs of the domains censored at any time in [first, last].
+        """
+        first = np.datetime64(first, "D").view(np.int64)
+        last = np.datetime64(last, "D").view(np.int64)
+        mask = (self._start_days <= last) & (self._end_days >= first)
+        hit = np.zeros(len(self.domains), dtype=bool)
+        hit[self.run_domain[mask]] = True
+        return np.flatnonzero(hit)
+
+    def days_censored(self):
+        """
+        Return, for every domain ID, the number of snapshots it was censored in.
+        """
+        return np.add.reduceat(self.lengths, self.offsets[:-1]) if len(self.lengths) else np.zeros(0, dtype=np.int32)
+
+    def longest(self):
+        """
+        Return the run number (an index into starts/ends/lengths) of the
+        longest run of every domain ID; ties go to the earliest run.
+        """
+        order = np.lexsort((-self.lengths, self.run_domain))
+        return order[self.offsets[:-1]]
+
+if __name__ == '__main__':
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "ho:s:d:", ["help", "out=", "store=", "domain=", "on=", "during=", "longest", "durations", "fewer-than="])
+    except getopt.GetoptError as err:
+        eprint(err)
+        usage()
+        sys.exit(2)
+
+    output_file = sys.stdout
+    store_prefix = None
+    domain = None
+    on = None
+    during = None
+    longest = False
+    durations = False
+    fewer_than = None
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            usage()
+            sys.exit(0)
+        elif o in ("-o", "--out"):
+            output_file = open(a, 'w')
+        elif o in ("-s", "--store"):
+            store_prefix = a
+        elif o in ("-d", "--domain"):
+            domain = a
+        elif o == "--on":
+            on = a
+        elif o == "--during":
+            during = a.split(",")
+        elif o == "--longest":
+            longest = True
+        elif o == "--durations":
+            durations = True
+        elif o == "--fewer-than":
+            fewer_than = int(a)
+
+    if not store_prefix:
+        eprint("Error: --store is required")
+        usage()
+        sys.exit(2)
+
+    index = IntervalIndex.open(store_prefix)
+    writer = csv.writer(output_file)
+
+    if domain is not None and on is not None:
+        writer.writerow(["domain", "date", "censored"])
+        writer.writerow([domain, on, int(index.blocked_on(domain, on))])
+    elif domain is not None:
+        writer.writerow(["start", "end", "days"])
+        for start, end, days in index.runs(domain):
+            writer.writerow([start, end, days])
+    elif on is not None or during is not None:
+        first, last = (on, on) if on is not None else during
+        for i in index.blocked_during(first, last):
+            output_file.write(index.domains[i] + "\n")
+    elif longest:
+        writer.writerow(["domain", "start", "end", "days"])
+        for d, k in zip(index.domains, index.longest()):
+            writer.writerow([d, index.starts[k], index.ends[k], index.lengths[k]])
+    elif durations:
+        writer.writerow(["domain", "count"])
+        for d, count in zip(index.domains, index.days_censored()):
+            writer.writerow([d, count])
+    elif fewer_than is not None:
+        for d, count in zip(index.domains, index.days_censored()):
+            if count < fewer_than:
+                output_file.write(d + "\n")
+    else:
+        eprint("Error: no query given")
+        usage()
+        sys.exit(2)
+
+    if output_file is not sys.stdout:
+        output_file.close()
@@ -2,6 +2,7 @@
 
 import getopt
 import sys
+import os
 import json
 import re
 
@@ -15,6 +16,9 @@ from brokenaxes import brokenaxes
 
 import common
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+import churnlog
+
 FIGSIZE = (common.COLUMNWIDTH, 2.0)
 
 def usage(f=sys.stderr):
@@ -27,6 +31,8 @@ Each JSON file should contain a dictionary with date keys. For each date, the JS
   "number_removed": <int>
   "domain_added": [list of domains]
   "domain_removed": [list of domains]
+Files ending in .churn are read as binary churn logs (see ../data/churnlog.py); only their per-day
+counts are read.
 
 Options:
   -h, --help            Show this help message
@@ -53,8 +59,13 @@ def load_json_to_dataframe(filename):
     We compute a cumulative "Domain Count" for each date.
     For the first day, we treat the daily diff as having 0 additions/drops for plotting.
     """
-    with open(filename, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    if filename.endswith(".churn"):
+        log = churnlog.ChurnLog(filename)
+        data = {str(d): {"number_added": int(a), "number_removed": int(r)}
+                for d, a, r in zip(log.dates, log.number_added, log.number_removed)}
+    else:
+        with open(filename, 'r', encoding='utf-8') as f:
+            data = json.load(f)
     records = []
     sorted_dates = sorted(data.keys())
     cumulative = None
@@ -2,11 +2,14 @@
 
 import sys
 import getopt
-import glob
 from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
 
+import compressed
+import presence
+import suffix
+
 def usage(f=sys.stderr):
     program = sys.argv[0]
     f.write(f"""\
@@ -28,46 +31,122 @@ Options:
   -d, --drop-high=NUM            high threshold for drop detection (default: 50)
   -l, --drop-low=NUM             low threshold for drop detection (default: 10)
   -m, --min-domains=NUM          minimum number of domains per TLD to include (default: 10)
+  --store=PREFIX                 read domain histories from the presence store at PREFIX (see presence.py)
+                                 instead of day-by-day text; may be given more than once
+
+The threshold options (-j, -k, -d, -l, -m) accept comma-separated lists. With more than one
+value, every combination is evaluated against the same TLD x day counts, and the CSV gets
+leading columns with the thresholds of each row.
 
 Example:
   {program} -s 2023-11-05 -f 2023-11-21 -e 2023-12-31 -j 10 -k 80 -d 50 -l 10 -m 10 < henan-day-by-day-check.txt > output.csv
+  {program} --store henan-presence -j 5,10,20 -k 60,80 > sweep.csv
 """)
 
 def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
 
-def input_files(args, binary=False):
-    STDIN = sys.stdin.buffer if binary else sys.stdin
-    MODE = 'rb' if binary else 'r'
-    if not args:
-        yield STDIN
-    else:
-        for arg in args:
-            if arg == "-":
-                yield STDIN
-            else:
-                for path in glob.glob(arg):
-                    with open(path, MODE) as f:
-                        yield f
+input_files = compressed.input_files
 
-def get_tld(domain):
-    parts = domain.split(".")
-    if len(parts) >= 3:
-        return ".".join(parts[-2:])  # e.g., "co.uk", "org.uk"
-    else:
-        return parts[-1]  # e.g., "com", "net"
+THRESHOLD_COLUMNS = ["Jump Low", "Jump High", "Drop High", "Drop Low", "Min Domains"]
+
+def read_histories(files, binary=False, start=0, end=None):
+    """
+    Parse day-by-day text ("domain    0110...") into a list of domains and a
+    (domains, days) uint8 0/1 matrix of the days in [start, end). Histories
+    may differ in length outside that window, but not within it.
+    """
+    domains = []
+    histories = []
+    for f in files:
+        for line in f:
+            if binary:
+                line = line.decode("utf-8", errors="replace")
+            parts = line.strip().rsplit(maxsplit=1)
+            if len(parts) == 2:
+                domains.append(parts[0].strip())
+                histories.append(parts[1][start:end])
+    width = len(histories[0]) if histories else 0
+    if any(len(h) != width for h in histories):
+        raise ValueError("domain histories have different lengths in the filter date range")
+    matrix = np.frombuffer("".join(histories).encode("ascii"), dtype=np.uint8).reshape(len(histories), width)
+    return domains, matrix - ord("0")
+
+def read_stores(prefixes, start_date):
+    """
+    Read the calendar matrices of presence stores, aligned so that column 0
+    is start_date, and stack their rows.
+    """
+    domains = []
+    blocks = []
+    for prefix in prefixes:
+        store = presence.PresenceStore(prefix)
+        first, matrix = store.calendar()
+        shift = (datetime.combine(first, datetime.min.time()) - start_date).days
+        if shift < 0:
+            matrix = matrix[:, -shift:]
+            shift = 0
+        domains.extend(store.domains)
+        blocks.append((shift, matrix))
+    width = max((shift + m.shape[1] for shift, m in blocks), default=0)
+    out = np.zeros((len(domains), width), dtype=np.uint8)
+    row = 0
+    for shift, m in blocks:
+        out[row:row + len(m), shift:shift + m.shape[1]] = m
+        row += len(m)
+    return domains, out
+
+def tld_day_counts(domains, matrix):
+    """
+    Group domain histories by TLD. Return (tlds, rows, distinct, counts):
+    the sorted TLDs, the number of history rows and of distinct domains of
+    each, and the (tlds, days) number of rows censored on each day.
+    """
+    tld_codes, tlds = pd.factorize(pd.Series(suffix.last_labels_many(domains)), sort=True)
+    domain_codes, _ = pd.factorize(pd.Series(domains))
+    rows = np.bincount(tld_codes, minlength=len(tlds))
+    pairs = np.unique(tld_codes.astype(np.int64) * (domain_codes.max(initial=0) + 1) + domain_codes)
+    distinct = np.bincount(pairs // (domain_codes.max(initial=0) + 1), minlength=len(tlds))
+    order = np.argsort(tld_codes, kind="stable")
+    starts = np.concatenate([[0], np.cumsum(rows)[:-1]])
+    present = rows > 0
+    counts = np.zeros((len(tlds), matrix.shape[1]), dtype=np.int64)
+    if present.any() and matrix.shape[1]:
+        counts[present] = np.add.reduceat(matrix[order].astype(np.int64), starts[present], axis=0)
+    return np.asarray(tlds, dtype=object), rows, distinct, counts
+
+def detect(counts, rows, jump_low, jump_high, drop_high, drop_low):
+    """
+    Find jumps and drops in the per-TLD censored share. jump_low etc. are
+    arrays of one value per threshold combination. Return (combo, tld, day,
+    is_jump) index arrays; day i is the change from day i-1 to day i.
+    """
+    ratio = counts / rows[:, None]
+    percentages = (ratio * 100).astype(int)
+    old = percentages[None, :, :-1]
+    new = percentages[None, :, 1:]
+    def col(a):
+        return np.asarray(a)[:, None, None]
+    jump = (old < col(jump_low)) & (new > col(jump_high))
+    drop = ~jump & (old >= col(drop_high)) & (new <= col(drop_low))
+    combo, tld, day = np.nonzero(jump | drop)
+    return combo, tld, day + 1, jump[combo, tld, day]
+
+def parse_thresholds(a):
+    return [int(x) for x in a.split(",")]
 
 if __name__ == '__main__':
     # Default configuration values
     start_date_str = "2023-11-05"
     filter_start_date_str = "2023-11-21"
     filter_end_date_str = "2024-03-03"
-    jump_low = 10
-    jump_high = 80
-    drop_high = 50
-    drop_low = 10
-    min_domains = 10
+    jump_low = [10]
+    jump_high = [80]
+    drop_high = [50]
+    drop_low = [10]
+    min_domains = [10]
     binary_input = False
+    stores = []
     output_file = sys.stdout
 
     # Parse command-line options
@@ -76,7 +155,7 @@ if __name__ == '__main__':
             sys.argv[1:],
             "ho:bs:f:e:j:k:d:l:m:",
             ["help", "out=", "binary", "start-date=", "filter-start-date=", "filter-end-date=",
-             "jump-low=", "jump-high=", "drop-high=", "drop-low=", "min-domains="]
+             "jump-low=", "jump-high=", "drop-high=", "drop-low=", "min-domains=", "store="]
         )
     except getopt.GetoptError as err:
         eprint(err)
@@ -98,15 +177,17 @@ if __name__ == '__main__':
         elif o in ("-e", "--filter-end-date"):
             filter_end_date_str = a
         elif o in ("-j", "--jump-low"):
-            jump_low = int(a)
+            jump_low = parse_thresholds(a)
         elif o in ("-k", "--jump-high"):
-            jump_high = int(a)
+            jump_high = parse_thresholds(a)
         elif o in ("-d", "--drop-high"):
-            drop_high = int(a)
+            drop_high = parse_thresholds(a)
         elif o in ("-l", "--drop-low"):
-            drop_low = int(a)
+            drop_low = parse_thresholds(a)
         elif o in ("-m", "--min-domains"):
-            min_domains = int(a)
+            min_domains = parse_thresholds(a)
+        elif o == "--store":
+            stores.append(a)
 
     # Convert date strings to datetime objects
     try:
@@ -117,86 +198,56 @@ if __name__ == '__main__':
         eprint("Error parsing dates:", e)
         sys.exit(1)
 
-    # Calculate indices for slicing history lists
+    # Calculate indices for slicing history columns
     start_index = (filter_start_date - start_date).days
     end_index = (filter_end_date - start_date).days + 1
 
-    # Read all input lines from provided files or STDIN
-    all_lines = []
-    for f in input_files(args, binary=binary_input):
-        for line in f:
-            if binary_input:
-                line = line.decode("utf-8", errors="replace")
-            line = line.strip()
-            if not line:
-                continue
-            all_lines.append(line)
-
-    # Process the input lines to extract (domain, history)
-    data = []
-    for line in all_lines:
-        parts = line.rsplit(maxsplit=1)
-        if len(parts) == 2:
-            domain, history = parts
-            data.append((domain.strip(), history.strip()))
-
-    if not data:
-        eprint("No valid data found in input.")
+    # Read (domain, history) from presence stores, or from files or STDIN
+    try:
+        if stores:
+            domains, matrix = read_stores(stores, start_date)
+            matrix = matrix[:, start_index:end_index]
+        else:
+            domains, matrix = read_histories(input_files(args, binary=binary_input), binary=binary_input,
+                                             start=start_index, end=end_index)
+    except ValueError as e:
+        eprint("Error reading input:", e)
         sys.exit(1)
 
-    # Convert to DataFrame
-    df = pd.DataFrame(data, columns=["Domain", "History"])
-
-    # Extract TLDs
-    df["TLD"] = df["Domain"].apply(get_tld)
-
-    # Convert history string to list of integers and slice by date indices
-    df["History"] = df["History"].apply(lambda x: [int(c) for c in x])
-    df["History"] = df["History"].apply(lambda x: x[start_index:end_index])
-
-    # Aggregate by TLD: compute the mean blocked ratio per day for each TLD
-    tld_stats = df.groupby("TLD")["History"].apply(lambda x: np.array(x.tolist()).mean(axis=0))
-
-    # Count how many domains are under each TLD
-    tld_counts = df.groupby("TLD")["Domain"].nunique()
-
-    # Filter out TLDs that have more than the configured minimum number of associated domains
-    filtered_tlds = tld_counts[tld_counts > min_domains].index
-
-    # Keep only aggregated stats for TLDs that pass the filter
-    filtered_tld_stats = {tld: history for tld, history in tld_stats.items() if tld in filtered_tlds}
-
-    # Create a list of rows for each event we detect
-    analysis_rows = []
-
-    for tld, history in filtered_tld_stats.items():
-        # Convert from ratio to absolute counts
-        total_domains_for_tld = len(df[df["TLD"] == tld])
-        absolute_counts = np.array(history) * total_domains_for_tld
-
-        # Convert ratios to integer percentages
-        percentages = (history * 100).astype(int)
-
-        # Iterate through the days in the slice (starting from the second day)
-        for i in range(1, len(percentages)):
-            change_date = filter_start_date + timedelta(days=i)
-            formatted_date = change_date.strftime("%Y-%m-%d")
-
-            old_pct = percentages[i-1]
-            new_pct = percentages[i]
-            old_abs = int(absolute_counts[i-1])
-            new_abs = int(absolute_counts[i])
+    if not domains:
+        eprint("No valid data found in input.")
+        sys.exit(1)
 
-            # Check conditions using the configurable thresholds
-            if old_pct < jump_low and new_pct > jump_high:
-                note = f"Addition of {tld}, Jump from {old_pct}% to {new_pct}%, {old_abs} to {new_abs}"
-            elif old_pct >= drop_high and new_pct <= drop_low:
-                note = f"Removal of {tld}, Drop from {old_pct}% to {new_pct}%, {old_abs} to {new_abs}"
+    # Aggregate by TLD: per-day number of censored domains for each TLD
+    tlds, rows, distinct, counts = tld_day_counts(domains, matrix)
+
+    # Every combination of thresholds, evaluated together
+    combos = np.array(np.meshgrid(jump_low, jump_high, drop_high, drop_low, min_domains, indexing="ij")).reshape(5, -1).T
+    combo, tld, day, is_jump = detect(counts, rows, *combos[:, :4].T)
+
+    # Keep only TLDs with more than the combination's minimum number of distinct domains
+    keep = distinct[tld] > combos[combo, 4]
+    combo, tld, day, is_jump = combo[keep], tld[keep], day[keep], is_jump[keep]
+
+    ratio = counts / rows[:, None]
+    percentages = (ratio * 100).astype(int)
+    absolute_counts = (ratio * rows[:, None]).astype(int)
+
+    # Create a list of rows for each event we detect, per combination
+    frames = []
+    columns = ["TLD", "Date", "Old Percentage", "New Percentage", "Old Number", "New Number", "Notes"]
+    for k, thresholds in enumerate(combos):
+        analysis_rows = []
+        for t, i, j in zip(tld[combo == k], day[combo == k], is_jump[combo == k]):
+            formatted_date = (filter_start_date + timedelta(days=int(i))).strftime("%Y-%m-%d")
+            old_pct, new_pct = percentages[t, i - 1], percentages[t, i]
+            old_abs, new_abs = absolute_counts[t, i - 1], absolute_counts[t, i]
+            if j:
+                note = f"Addition of {tlds[t]}, Jump from {old_pct}% to {new_pct}%, {old_abs} to {new_abs}"
             else:
-                continue
-
+                note = f"Removal of {tlds[t]}, Drop from {old_pct}% to {new_pct}%, {old_abs} to {new_abs}"
             analysis_rows.append([
-                tld,
+                tlds[t],
                 formatted_date,
                 f"{old_pct}%",
                 f"{new_pct}%",
@@ -205,15 +256,16 @@ if __name__ == '__main__':
                 note
             ])
 
-    # Convert the collected analysis into a DataFrame and sort by Date
-    analysis_df = pd.DataFrame(
-        analysis_rows,
-        columns=["TLD", "Date", "Old Percentage", "New Percentage", "Old Number", "New Number", "Notes"]
-    )
-    analysis_df = analysis_df.sort_values(by="Date")
+        # Convert the collected analysis into a DataFrame and sort by Date
+        analysis_df = pd.DataFrame(analysis_rows, columns=columns)
+        analysis_df = analysis_df.sort_values(by="Date")
+        if len(combos) > 1:
+            for name, value in reversed(list(zip(THRESHOLD_COLUMNS, thresholds))):
+                analysis_df.insert(0, name, value)
+        frames.append(analysis_df)
 
     # Output CSV results
-    print(analysis_df.to_csv(index=False), file=output_file)
+    print(pd.concat(frames).to_csv(index=False), file=output_file)
 
     # Only close the output file if it is not sys.stdout
     if output_file is not sys.stdout:
@@ -5,9 +5,14 @@ import re
 import sys
 import json
 from datetime import date
-import tldextract  # pip install tldextract
 import getopt
 
+import numpy as np
+
+import churnlog
+import ingest
+import suffix
+
 # -----------------------------------------------------------------------------
 # Configuration
 # -----------------------------------------------------------------------------
@@ -35,35 +40,11 @@ def parse_date_from_filename(filename):
         return date(year, month, day)
     return None
 
-def read_domains_from_file(filepath):
-    """
-    Read the file line by line, stripping whitespace.
-    Return a set of domain names (skip blank lines).
-    """
-    domains = set()
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            for line in f:
-                domain = line.strip()
-                if domain:
-                    domains.add(domain)
-    except Exception as e:
-        eprint(f"Error reading {filepath}: {e}")
-    return domains
-
-def domain_sort_key(domain):
-    """
-    Given a domain, return a tuple (suffix, domain, subdomain) to sort
-    by TLD/secondary TLD first, then primary domain, then subdomain.
-
-    e.g. "www.google.co.uk" => suffix="co.uk", domain="google", subdomain="www"
-    """
-    extracted = tldextract.extract(domain)
-    return (extracted.suffix, extracted.domain, extracted.subdomain)
-
 def usage():
     prog = sys.argv[0]
-    print(f"Usage: {prog} --henan | --gfw")
+    print(f"Usage: {prog} --henan | --gfw [--binary]")
+    print("  --binary    write a binary churn log (see churnlog.py) instead of JSON")
+    print("  --jobs=N    read the daily files with N worker processes (default: one per CPU)")
     sys.exit(1)
 
 # -----------------------------------------------------------------------------
@@ -73,17 +54,23 @@ def usage():
 def main():
     # Parse command-line arguments for mode: --henan or --gfw
     try:
-        opts, args = getopt.getopt(sys.argv[1:], "", ["henan", "gfw"])
+        opts, args = getopt.getopt(sys.argv[1:], "", ["henan", "gfw", "binary", "jobs="])
     except getopt.GetoptError as err:
         eprint(err)
         usage()
 
     mode = None
+    binary = False
+    nprocs = None
     for o, a in opts:
         if o == "--henan":
             mode = "henan"
         elif o == "--gfw":
             mode = "gfw"
+        elif o == "--binary":
+            binary = True
+        elif o == "--jobs":
+            nprocs = int(a)
 
     if mode is None:
         eprint("Error: Must specify either --henan or --gfw")
@@ -113,36 +100,42 @@ def main():
         eprint("No matching files found. Exiting.")
         sys.exit(1)
 
-    # 3. Read domains for each day
-    day_to_domains = {}
-    for d in sorted_days:
-        day_to_domains[d] = read_domains_from_file(date_to_file[d])
+    # 3. Read the domain IDs of each day
+    index, day_ids = ingest.ingest([date_to_file[d] for d in sorted_days], nprocs=nprocs)
+    domains = np.array(list(index), dtype=object)
 
-    # 4. Compare each day’s domains with the previous day and build JSON output
-    output = {}
+    # 4. Compare each day’s domains with the previous day
+    days = []
     previous_domains = None
 
-    for current_day in sorted_days:
+    for current_day, ids in zip(sorted_days, day_ids):
         date_str = current_day.strftime("%Y-%m-%d")
-        current_domains = day_to_domains[current_day]
+        current_domains = np.sort(ids)
         if previous_domains is None:
             # For the first day, consider all domains as "added"
             added = current_domains
-            removed = set()
+            removed = current_domains[:0]
         else:
-            added = current_domains - previous_domains
-            removed = previous_domains - current_domains
+            added = np.setdiff1d(current_domains, previous_domains, assume_unique=True)
+            removed = np.setdiff1d(previous_domains, current_domains, assume_unique=True)
+
+        days.append((date_str, domains[added].tolist(), domains[removed].tolist()))
+
+        previous_domains = current_domains
+
+    # 5. Output the binary churn log or JSON to stdout
+    if binary:
+        churnlog.write(sys.stdout.buffer, days)
+        return
 
+    output = {}
+    for date_str, added, removed in days:
         output[date_str] = {
             "number_added": len(added),
             "number_removed": len(removed),
-            "domain_added": sorted(list(added), key=domain_sort_key),
-            "domain_removed": sorted(list(removed), key=domain_sort_key)
+            "domain_added": suffix.sort_domains(added),
+            "domain_removed": suffix.sort_domains(removed)
         }
-
-        previous_domains = current_domains
-
-    # 5. Output JSON to stdout
     print(json.dumps(output, indent=2))
 
 if __name__ == "__main__":
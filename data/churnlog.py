@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+import sys
+import getopt
+import json
+import mmap
+import struct
+
+import numpy as np
+
+import suffix
+
+# A churn log holds the same data as churn-by-day-*.json: for every date,
+# the domains added to and removed from the blocklist since the previous
+# snapshot. It is laid out so that readers can mmap it and get per-day
+# counts without touching the domain lists:
+#
+#   header      HEADER: magic, days, domains, string table size, first date
+#                       (days since 1970-01-01)
+#   offsets     uint64[days + 1]: start of each day's IDs in the ID section
+#   added       uint32[days]: number of domains added on each date
+#   removed     uint32[days]: number of domains removed on each date
+#   deltas      uint16[days]: days since the previous date (0 for the first)
+#   ids         uint32[...]: for each date, the added IDs then the removed
+#                            IDs, each in ascending order
+#   strings     the domain string table, "\n"-separated UTF-8
+#
+# Numeric sections are padded to 8 bytes. Domain IDs index the string
+# table, which is sorted by suffix.sort_domains(), so ascending IDs are in
+# the same order as the JSON lists.
+
+MAGIC = b"CHURNLG1"
+HEADER = struct.Struct("<8sIIQq")
+
+def usage(f=sys.stderr):
+    program = sys.argv[0]
+    f.write(f"""\
+Usage: {program} [OPTIONS] FILE
+This script reads a binary churn log written by churn-each-day.py --binary and exports it.
+
+  -h, --help            show this help
+  -o, --out             write to file (default: stdout)
+  -j, --json            export the full log as JSON, in the churn-each-day.py format (default)
+  -c, --counts          export per-day counts as CSV: date, number_added, number_removed
+
+Example:
+  {program} --json churn-by-day-gfw.churn > churn-by-day-gfw.json
+""")
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+def _pad(n):
+    return -n % 8
+
+def write(f, days):
+    """
+    Write a churn log to the binary file object f. days is a list of
+    (YYYY-MM-DD, added, removed) in date order, with added and removed
+    iterables of domains.
+    """
+    domains = suffix.sort_domains(set().union(*(a for _, a, _ in days), *(r for _, _, r in days)))
+    ids = {d: i for i, d in enumerate(domains)}
+    dates = np.array([d for d, _, _ in days], dtype="datetime64[D]").astype(np.int64)
+    deltas = np.diff(dates, prepend=dates[:1]).astype(np.uint16)
+    added = np.array([len(a) for _, a, _ in days], dtype=np.uint32)
+    removed = np.array([len(r) for _, _, r in days], dtype=np.uint32)
+    offsets = np.concatenate([[0], np.cumsum(added.astype(np.uint64) + removed)]).astype(np.uint64)
+    table = "\n".join(domains).encode("utf-8")
+
+    f.write(HEADER.pack(MAGIC, len(days), len(domains), len(table), dates[0] if len(days) else 0))
+    for section in (offsets, added, removed, deltas):
+        f.write(section.tobytes())
+        f.write(b"\0" * _pad(section.nbytes))
+    nids = 0
+    for _, a, r in days:
+        for group in (a, r):
+            section = np.sort(np.fromiter((ids[d] for d in group), dtype=np.uint32, count=len(group)))
+            f.write(section.tobytes())
+            nids += len(group)
+    f.write(b"\0" * _pad(nids * 4))
+    f.write(table)
+
+class ChurnLog:
+    """
+    A memory-mapped churn log. Counts and dates are NumPy views into the
+    file; domain lists are decoded only for the dates that are asked for.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, ndays, ndomains, table_size, first = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a churn log")
+        pos = HEADER.size
+        sections = []
+        for dtype, count in ((np.uint64, ndays + 1), (np.uint32, ndays), (np.uint32, ndays), (np.uint16, ndays)):
+            sections.append(np.frombuffer(self._mm, dtype=dtype, count=count, offset=pos))
+            pos += sections[-1].nbytes + _pad(sections[-1].nbytes)
+        self.offsets, self.number_added, self.number_removed, deltas = sections
+        self.ids = np.frombuffer(self._mm, dtype=np.uint32, count=int(self.offsets[-1]), offset=pos)
+        pos += self.ids.nbytes + _pad(self.ids.nbytes)
+        self._table = (pos, table_size)
+        self.ndomains = ndomains
+        self.dates = (first + np.cumsum(deltas, dtype=np.int64)).astype("datetime64[D]")
+        self._domains = None
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def domains(self):
+        """
+        The domain string table, decoded on first use.
+        """
+        if self._domains is None:
+            pos, size = self._table
+            self._domains = self._mm[pos:pos + size].decode("utf-8").split("\n") if size else []
+        return self._domains
+
+    def added_ids(self, i):
+        start = int(self.offsets[i])
+        return self.ids[start:start + int(self.number_added[i])]
+
+    def removed_ids(self, i):
+        return self.ids[int(self.offsets[i]) + int(self.number_added[i]):int(self.offsets[i + 1])]
+
+    def added(self, i):
+        domains = self.domains
+        return [domains[x] for x in self.added_ids(i)]
+
+    def removed(self, i):
+        domains = self.domains
+        return [domains[x] for x in self.removed_ids(i)]
+
+    def first_dates(self):
+        """
+        Return (first_added, first_removed): for every domain ID, the index
+        of the first date it was added/removed on, or -1.
+        """
+        first_added = np.full(self.ndomains, -1, dtype=np.int64)
+        first_removed = np.full(self.ndomains, -1, dtype=np.int64)
+        for i in range(len(self)):
+            for first, ids in ((first_added, self.added_ids(i)), (first_removed, self.removed_ids(i))):
+                ids = ids[first[ids] < 0]
+                first[ids] = i
+        return first_added, first_removed
+
+    def to_dict(self):
+        """
+        Return the log in the churn-each-day.py JSON structure.
+        """
+        return {
+            str(d): {
+                "number_added": int(self.number_added[i]),
+                "number_removed": int(self.number_removed[i]),
+                "domain_added": self.added(i),
+                "domain_removed": self.removed(i),
+            }
+            for i, d in enumerate(self.dates)
+        }
+
+if __name__ == '__main__':
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "ho:jc", ["help", "out=", "json", "counts"])
+    except getopt.GetoptError as err:
+        eprint(err)
+        usage()
+        sys.exit(2)
+
+    output_file = sys.stdout
+    counts = False
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            usage()
+            sys.exit(0)
+        elif o in ("-o", "--out"):
+            output_file = open(a, 'w')
+        elif o in ("-j", "--json"):
+            counts = False
+        elif o in ("-c", "--counts"):
+            counts = True
+
+    if len(args) != 1:
+        usage()
+        sys.exit(2)
+
+    log = ChurnLog(args[0])
+    if counts:
+        output_file.write("date,number_added,number_removed\n")
+        for d, a, r in zip(log.dates, log.number_added, log.number_removed):
+            output_file.write(f"{d},{a},{r}\n")
+    else:
+        print(json.dumps(log.to_dict(), indent=2), file=output_file)
+
+    if output_file is not sys.stdout:
+        output_file.close()
@@ -0,0 +1,299 @@
+import builtins
+import glob
+import io
+import lzma
+import os
+import struct
+import sys
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard  # pip install zstandard
+except ImportError:
+    zstandard = None
+
+# Transparent reading of .xz and .zst inputs.
+#
+# open() and input_files() sniff the first bytes of every input and
+# decompress xz and zstd streams on the fly, so tools can be pointed at the
+# checked-in *.xz files instead of being fed through `xzcat |`.
+#
+# A seekable .xz file is read through its index: every block is located up
+# front and decompressed independently in a thread pool (liblzma releases
+# the GIL), at most READAHEAD blocks ahead of the reader. Because blocks are
+# independent, a byte range of the uncompressed data can be read by
+# decompressing only the blocks that overlap it. Files with a single block
+# (the default of single-threaded `xz`), non-seekable inputs like stdin, and
+# .zst files are decompressed as one stream, READ_SIZE bytes at a time.
+# Write files with `xz -T0` or `xz --block-size=...` to get multiple blocks.
+
+XZ_MAGIC = b"\xfd7zXZ\x00"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+READ_SIZE = 1 << 20
+
+# Decompressed blocks buffered ahead of the reader, per file.
+READAHEAD = 4
+
+def threads():
+    """
+    Return the default number of decompression threads.
+    """
+    return os.cpu_count() or 1
+
+def _multibyte(buf, pos):
+    value = 0
+    for i in range(9):
+        byte = buf[pos + i]
+        value |= (byte & 0x7F) << (7 * i)
+        if not byte & 0x80:
+            return value, pos + i + 1
+    raise ValueError("xz: bad multibyte integer")
+
+def _encode_multibyte(value):
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+def _padded(n):
+    return n + (-n % 4)
+
+def xz_blocks(f):
+    """
+    Return the blocks of a seekable .xz file as a list of (stream_flags,
+    offset, unpadded_size, uncompressed_offset, uncompressed_size), reading
+    only the stream footers and indexes. Raises ValueError if the file is
+    not a well-formed .xz file.
+    """
+    end = f.seek(0, os.SEEK_END)
+    streams = []
+    while end > 0:
+        # Stream padding is a multiple of four null bytes.
+        f.seek(end - 4)
+        if f.read(4) == b"\0\0\0\0":
+            end -= 4
+            continue
+        if end < 24:
+            raise ValueError("xz: truncated file")
+        f.seek(end - 12)
+        footer = f.read(12)
+        if footer[10:] != b"YZ":
+            raise ValueError("xz: bad stream footer")
+        backward_size = (struct.unpack("<I", footer[4:8])[0] + 1) * 4
+        flags = footer[8:10]
+        index_start = end - 12 - backward_size
+        f.seek(index_start)
+        index = f.read(backward_size)
+        if index[0] != 0:
+            raise ValueError("xz: bad index")
+        count, pos = _multibyte(index, 1)
+        records = []
+        for _ in range(count):
+            unpadded, pos = _multibyte(index, pos)
+            uncompressed, pos = _multibyte(index, pos)
+            records.append((unpadded, uncompressed))
+        stream_start = index_start - sum(_padded(u) for u, _ in records) - 12
+        if stream_start < 0:
+            raise ValueError("xz: bad index")
+        streams.append((stream_start, flags, records))
+        end = stream_start
+
+    blocks = []
+    uncompressed_offset = 0
+    for stream_start, flags, records in reversed(streams):
+        offset = stream_start + 12
+        for unpadded, uncompressed in records:
+            blocks.append((flags, offset, unpadded, uncompressed_offset, uncompressed))
+            offset += _padded(unpadded)
+            uncompressed_offset += uncompressed
+    return blocks
+
+def _decompress_block(fd, flags, offset, unpadded, uncompressed):
+    # Wrap the block in a stream of its own (header, block, one-record
+    # index, footer) so that liblzma can decode and verify it on its own.
+    data = os.pread(fd, _padded(unpadded), offset)
+    header = XZ_MAGIC + flags + struct.pack("<I", zlib.crc32(flags))
+    index = b"\0" + _encode_multibyte(1) + _encode_multibyte(unpadded) + _encode_multibyte(uncompressed)
+    index += b"\0" * (-len(index) % 4)
+    index += struct.pack("<I", zlib.crc32(index))
+    tail = struct.pack("<I", len(index) // 4 - 1) + flags
+    footer = struct.pack("<I", zlib.crc32(tail)) + tail + b"YZ"
+    return lzma.decompress(header + data + index + footer, format=lzma.FORMAT_XZ)
+
+def _xz_block_chunks(f, blocks, start, stop, nthreads, readahead):
+    blocks = [b for b in blocks if b[3] + b[4] > start and (stop is None or b[3] < stop)]
+    fd = f.fileno()
+    with ThreadPoolExecutor(max_workers=nthreads) as pool:
+        pending = deque()
+        todo = iter(blocks)
+        for block in todo:
+            pending.append((block, pool.submit(_decompress_block, fd, block[0], block[1], block[2], block[4])))
+            if len(pending) >= readahead:
+                break
+        while pending:
+            (_, _, _, offset, size), future = pending.popleft()
+            for block in todo:
+                pending.append((block, pool.submit(_decompress_block, fd, block[0], block[1], block[2], block[4])))
+                break
+            data = future.result()
+            lo = max(start - offset, 0)
+            hi = size if stop is None else min(stop - offset, size)
+            yield data[lo:hi] if lo or hi != size else data
+
+def _stream_chunks(f, decompressor, start, stop):
+    # Decompress sequentially, discarding output before start.
+    pos = 0
+    for data in decompressor(f):
+        if stop is not None and pos >= stop:
+            return
+        lo = max(start - pos, 0)
+        hi = len(data) if stop is None else min(stop - pos, len(data))
+        if lo < hi:
+            yield data[lo:hi]
+        pos += len(data)
+
+def _xz_stream(f):
+    # Concatenated streams each need a fresh decompressor.
+    d = lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+    while True:
+        if d.eof:
+            rest = d.unused_data.lstrip(b"\0")
+            d = lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+            if rest:
+                yield d.decompress(rest, max_length=READ_SIZE)
+                continue
+        if d.needs_input:
+            chunk = f.read(READ_SIZE)
+            if not chunk:
+                return
+            yield d.decompress(chunk, max_length=READ_SIZE)
+        else:
+            yield d.decompress(b"", max_length=READ_SIZE)
+
+def _zstd_stream(f):
+    if zstandard is None:
+        raise OSError("reading .zst input requires the zstandard module (pip install zstandard)")
+    reader = zstandard.ZstdDecompressor().stream_reader(f, read_size=READ_SIZE, read_across_frames=True)
+    while True:
+        data = reader.read(READ_SIZE)
+        if not data:
+            return
+        yield data
+
+def _plain_stream(f):
+    while True:
+        data = f.read(READ_SIZE)
+        if not data:
+            return
+        yield data
+
+class _ChunkReader(io.RawIOBase):
+    """
+    A read-only raw stream over an iterator of byte chunks.
+    """
+
+    def __init__(self, chunks, close=None):
+        self._chunks = chunks
+        self._buffer = memoryview(b"")
+        self._close = close
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._buffer = memoryview(chunk)
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._chunks.close()
+            if self._close is not None:
+                self._close()
+        super().close()
+
+def _peek(f, n):
+    if hasattr(f, "peek"):
+        return f.peek(n)[:n]
+    head = f.read(n)
+    f.seek(-len(head), os.SEEK_CUR)
+    return head
+
+def _seekable(f):
+    try:
+        return f.seekable() and f.fileno() >= 0
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return False
+
+def open_binary(f, start=0, stop=None, nthreads=None, readahead=READAHEAD, close=None):
+    """
+    Return a binary file object with the decompressed contents of the
+    binary file object f, which may be xz, zstd or uncompressed. Only
+    uncompressed bytes [start, stop) are returned.
+    """
+    head = _peek(f, 6)
+    if head.startswith(XZ_MAGIC):
+        blocks = None
+        if _seekable(f):
+            try:
+                blocks = xz_blocks(f)
+            except ValueError:
+                pass
+            f.seek(0)
+        if blocks is not None and (len(blocks) > 1 or start):
+            chunks = _xz_block_chunks(f, blocks, start, stop, nthreads or threads(), max(readahead, 1))
+        else:
+            chunks = _stream_chunks(f, _xz_stream, start, stop)
+    elif head.startswith(ZSTD_MAGIC):
+        chunks = _stream_chunks(f, _zstd_stream, start, stop)
+    elif start and _seekable(f):
+        f.seek(start)
+        chunks = _stream_chunks(f, _plain_stream, 0, None if stop is None else stop - start)
+    else:
+        chunks = _stream_chunks(f, _plain_stream, start, stop)
+    return io.BufferedReader(_ChunkReader(chunks, close), buffer_size=READ_SIZE)
+
+def open(path, mode='r', start=0, stop=None, nthreads=None, readahead=READAHEAD, encoding='utf-8'):
+    """
+    Open path for reading, decompressing .xz and .zst files transparently
+    (detected by content, not by name). mode is 'r' or 'rb'. start and
+    stop select a range of the uncompressed bytes.
+    """
+    if mode not in ('r', 'rb'):
+        raise ValueError(f"unsupported mode: {mode}")
+    raw = builtins.open(path, 'rb')
+    f = open_binary(raw, start, stop, nthreads, readahead, close=raw.close)
+    if mode == 'rb':
+        return f
+    return io.TextIOWrapper(f, encoding=encoding)
+
+def input_files(args, binary=False):
+    """
+    Yield a file object for every argument (glob patterns are expanded),
+    or for stdin if there are none or the argument is "-". Compressed
+    inputs, including on stdin, are decompressed transparently.
+    """
+    def stdin():
+        f = open_binary(sys.stdin.buffer)
+        return f if binary else io.TextIOWrapper(f, encoding='utf-8')
+    if not args:
+        yield stdin()
+    else:
+        for arg in args:
+            if arg == "-":
+                yield stdin()
+            else:
+                for path in glob.glob(arg):
+                    with open(path, 'rb' if binary else 'r') as f:
+                        yield f
@@ -0,0 +1,78 @@
+import os
+from multiprocessing import Pool
+
+import numpy as np
+
+# Shared ingestion of the daily censored-sni-*_YYYY-MM-DD.txt snapshots.
+#
+# Files are parsed in a process pool. Each worker takes a batch of files,
+# streams their lines, and interns the domains into a batch-local table, so
+# that a domain seen on many days crosses the process boundary once per
+# batch rather than once per day. The parent merges each batch table into
+# the global domain index and remaps the batch-local IDs with one NumPy
+# take per file. Batches are merged in file order, so domain IDs are
+# assigned in order of first appearance, exactly as a serial read would.
+
+# Files per worker task. Larger batches send fewer duplicate strings back
+# to the parent; smaller ones keep more workers busy on short runs.
+BATCH_FILES = 8
+
+def processes():
+    """
+    Return the default number of worker processes.
+    """
+    return os.cpu_count() or 1
+
+def read_domains(path):
+    """
+    Yield the stripped, non-blank lines of a snapshot file, streaming.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            domain = line.strip()
+            if domain:
+                yield domain
+
+def _parse_batch(paths):
+    table = {}
+    days = []
+    for path in paths:
+        seen = {}
+        for domain in read_domains(path):
+            if domain not in seen:
+                seen[domain] = table.setdefault(domain, len(table))
+        days.append(np.fromiter(seen.values(), dtype=np.int64, count=len(seen)))
+    return list(table), days
+
+def _batches(paths, size):
+    return [paths[i:i + size] for i in range(0, len(paths), size)]
+
+def ingest(paths, index=None, nprocs=None, batch_files=BATCH_FILES):
+    """
+    Read snapshot files and return (index, days). index maps every domain
+    to its ID and days holds, for each path in order, the IDs of the
+    distinct domains of that file in file order.
+
+    Pass an existing index to extend it; new domains get the next free IDs.
+    nprocs defaults to processes(); with 1, files are read in this process.
+    """
+    if index is None:
+        index = {}
+    if nprocs is None:
+        nprocs = processes()
+    batches = _batches(list(paths), batch_files)
+
+    days = []
+    def merge(result):
+        table, batch_days = result
+        remap = np.fromiter((index.setdefault(d, len(index)) for d in table), dtype=np.int64, count=len(table))
+        days.extend(remap[ids] for ids in batch_days)
+
+    if nprocs <= 1 or len(batches) <= 1:
+        for batch in batches:
+            merge(_parse_batch(batch))
+    else:
+        with Pool(min(nprocs, len(batches))) as pool:
+            for result in pool.imap(_parse_batch, batches):
+                merge(result)
+    return index, days
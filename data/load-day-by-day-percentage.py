@@ -2,61 +2,38 @@
 
 import sys
 import os
-import glob
-from collections import defaultdict
 
-def extract_tlds(domain):
-    parts = domain.split('.')
-    if len(parts) < 2:
-        return None, None  # Invalid domain
+import numpy as np
 
-    root = '.' + parts[-1]  # Example: ".com"
-    full_tld = '.'.join(parts[-2:]) if len(parts) > 2 else root  # Example: "com.pk", "co.uk"
+import presence
+import suffix
 
-    return root, full_tld
 
-
-
-def getfiles(pattern):
-    directory = os.getcwd()
-
-
-    domains = set()
-    # First pass to get the set of domains
-    files = glob.glob(os.path.join(directory, pattern))
-    for file_path in files:
-        with open(file_path, 'r') as f:
-            for domain in f.readlines():
-                domains.add(domain.strip())
-
-    data = defaultdict(list)
-    # Second pass build data
-    files = sorted(glob.glob(os.path.join(directory, pattern)), key=os.path.basename)
-    for file_path in files:
-        print(file_path)
-        with open(file_path, 'r') as f:
-            day_domains = set()
-            for domain in f.readlines():
-                day_domains.add(domain.strip())
-            # Those in today get a 1, otherwise 0
-            for d in day_domains:
-                data[d].append(1)
-            for d in domains - day_domains:
-                data[d].append(0)
-
-    return data
-
-
-gfw = getfiles('censored-sni-california*')
-henan = getfiles('censored-sni-guangzhou*')
+def getfiles(prefix, pattern):
+    # Bring the presence store up to date with the snapshots, building it on
+    # first use, then read the matrix from it. Appending reads only the
+    # snapshots of dates that are not in the store yet.
+    files = presence.snapshot_files([pattern])
+    presence.append(prefix, files)
+    for _, path in files:
+        print(os.path.join(os.getcwd(), path))
+    store = presence.PresenceStore(prefix)
+    return dict(zip(store.domains, store.matrix()))
 
 
 def savedata(fname, data):
     with open(fname, 'w') as f:
-        for d, v in sorted(data.items(), key=lambda x: (extract_tlds(x[0])[0], extract_tlds(x[0])[1], x[0], sum(x[1])), reverse=True):
+        for d, v in sorted(data.items(), key=lambda x: (*suffix.tld_parts(x[0]), x[0], np.sum(x[1])), reverse=True):
             f.write('% 30s    ' % d)
-            f.write(''.join(['%d' % x for x in v]))
+            f.write((v + ord('0')).tobytes().decode('ascii'))
             f.write('\n')
 
-savedata('gfw-day-by-day-check.txt', gfw)
-savedata('henan-day-by-day-check.txt', henan)
+if __name__ == '__main__':
+    # Building a store reads the snapshots with a multiprocessing pool, so
+    # this must not run again when the workers import the module.
+    gfw = getfiles('gfw-presence', 'censored-sni-california*')
+    henan = getfiles('henan-presence', 'censored-sni-guangzhou*')
+
+    savedata('gfw-day-by-day-check.txt', gfw)
+    savedata('henan-day-by-day-check.txt', henan)
+
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+
+import sys
+import getopt
+import glob
+import io
+import os
+import re
+from datetime import date
+
+import numpy as np
+
+import ingest
+
+# A presence store for one vantage point is three files sharing a prefix:
+#
+#   PREFIX.npy          uint8 matrix of shape (days, stride). Row i holds the
+#                       presence bits of every domain on the i-th ingested
+#                       date, packed 8 domains per byte (little bit order).
+#   PREFIX-domains.txt  the domain string table, one per line. The line
+#                       number is the domain ID, i.e. the bit column.
+#   PREFIX-dates.txt    the ingested dates (YYYY-MM-DD), one per line, in
+#                       row order.
+#
+# The matrix is opened with mmap, so tools only page in the rows they touch.
+# The dates table is written last and is what makes rows part of the store:
+# rows past its length, left by an interrupted append, are ignored and
+# overwritten by the next one.
+
+DATE_REGEX = re.compile(r"_(\d{4})-(\d{2})-(\d{2})\.txt$")
+
+# Default store prefixes and the daily snapshot files they are built from.
+VANTAGE_POINTS = {
+    "gfw": ("gfw-presence", "censored-sni-california_*.txt"),
+    "henan": ("henan-presence", "censored-sni-guangzhou_*.txt"),
+}
+
+# Whole-store reductions unpack this many rows at a time, so they never hold
+# more than CHUNK_DAYS x domains bytes in memory.
+CHUNK_DAYS = 64
+
+def usage(f=sys.stderr):
+    program = sys.argv[0]
+    f.write(f"""\
+Usage: {program} [OPTIONS] PREFIX [FILENAME...]
+This script builds a presence store from daily censored-sni-*_YYYY-MM-DD.txt snapshot files.
+The store is written to PREFIX.npy (packed domain x day bit matrix), PREFIX-domains.txt
+(domain string table) and PREFIX-dates.txt (ingested dates).
+
+  -h, --help            show this help
+  -a, --append          only ingest dates that are not in the store yet, extending it in
+                        place (builds the store if it does not exist; dates older than
+                        the last ingested one are inserted in order)
+  -j, --jobs=N          read the daily files with N worker processes (default: one per CPU)
+  --gfw                 shorthand for: gfw-presence 'censored-sni-california_*.txt'
+  --henan               shorthand for: henan-presence 'censored-sni-guangzhou_*.txt'
+
+Example:
+  {program} gfw-presence 'censored-sni-california_*.txt'
+  {program} --henan
+  {program} --append --gfw
+""")
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+def domains_path(prefix):
+    return prefix + "-domains.txt"
+
+def dates_path(prefix):
+    return prefix + "-dates.txt"
+
+def bits_path(prefix):
+    return prefix + ".npy"
+
+def snapshot_date(path):
+    """
+    Return the YYYY-MM-DD date of a snapshot filename, or None.
+    """
+    match = DATE_REGEX.search(os.path.basename(path))
+    if match:
+        return "-".join(match.groups())
+    return None
+
+def snapshot_files(patterns):
+    """
+    Expand glob patterns into a list of (date, path) pairs sorted by date.
+    Files without a date in their name are skipped.
+    """
+    files = {}
+    for pattern in patterns:
+        for path in glob.glob(pattern):
+            d = snapshot_date(path)
+            if d is not None:
+                files[d] = path
+    return sorted(files.items())
+
+def write_lines(path, lines):
+    """
+    Write a table to path through a temporary file, so that it is replaced
+    whole or not at all.
+    """
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        for line in lines:
+            f.write(line + "\n")
+    os.replace(tmp, path)
+
+def pack_row(ids, stride):
+    """
+    Pack an array of domain IDs into one row of stride bytes.
+    """
+    row = np.zeros(stride * 8, dtype=bool)
+    row[ids] = True
+    return np.packbits(row, bitorder="little")
+
+def build(prefix, files, nprocs=None):
+    """
+    Build a store at prefix from a list of (date, path) pairs, replacing
+    any existing store. Files are read with nprocs worker processes.
+    """
+    index, ids = ingest.ingest([path for _, path in files], nprocs=nprocs)
+    days = [(d, x) for (d, _), x in zip(files, ids)]
+
+    stride = (len(index) + 7) // 8
+    bits = np.lib.format.open_memmap(bits_path(prefix), mode="w+", dtype=np.uint8, shape=(len(days), stride))
+    for i, (_, ids) in enumerate(days):
+        bits[i] = pack_row(ids, stride)
+    bits.flush()
+    del bits
+
+    write_lines(domains_path(prefix), index)
+    write_lines(dates_path(prefix), [d for d, _ in days])
+
+def write_rows(prefix, nrows, rows, stride):
+    """
+    Write packed rows to PREFIX.npy in place after its first nrows rows,
+    dropping any rows past those, and rewrite only the header. Return False
+    if the new header does not fit in the old one's space.
+    """
+    with open(bits_path(prefix), 'r+b') as f:
+        np.lib.format.read_magic(f)
+        np.lib.format.read_array_header_1_0(f)
+        offset = f.tell()
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(header, {
+            "descr": np.lib.format.dtype_to_descr(np.dtype(np.uint8)),
+            "fortran_order": False,
+            "shape": (nrows + len(rows), stride),
+        })
+        if len(header.getvalue()) != offset:
+            return False
+        f.seek(offset + nrows * stride)
+        for row in rows:
+            f.write(row.tobytes())
+        f.truncate()
+        f.seek(0)
+        f.write(header.getvalue())
+    return True
+
+def regrow(prefix, old, rows, stride, positions=None):
+    """
+    Rewrite PREFIX.npy with the given stride, putting the new rows at
+    positions (by default after the old rows) and the old rows, in order,
+    in between. Columns past the old stride are zero.
+    """
+    n = len(old) + len(rows)
+    if positions is None:
+        positions = range(len(old), n)
+    is_new = np.zeros(n, dtype=bool)
+    is_new[list(positions)] = True
+    old_positions = np.flatnonzero(~is_new)
+
+    tmp = bits_path(prefix) + ".tmp"
+    bits = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.uint8, shape=(n, stride))
+    for start in range(0, len(old), CHUNK_DAYS):
+        bits[old_positions[start:start + CHUNK_DAYS], :old.shape[1]] = old[start:start + CHUNK_DAYS]
+    for position, row in zip(positions, rows):
+        bits[position] = row
+    bits.flush()
+    del bits
+    os.replace(tmp, bits_path(prefix))
+
+def append(prefix, files, nprocs=None):
+    """
+    Ingest the (date, path) pairs whose date is not in the store at prefix
+    yet. Returns the list of newly ingested dates.
+
+    New domains get the next free IDs; their bits on earlier dates are
+    already zero. Rows are appended to the matrix in place; only when the
+    domain table outgrows the row stride is the matrix rewritten, with 25%
+    headroom so that daily appends rarely pay for it. Rows are kept in date
+    order, so back-dated snapshots are inserted by rewriting the matrix from
+    the stored rows, without reading their snapshots again. The matrix is
+    written first, then the domain table and last the dates table, so an
+    interrupted append leaves the store as it was. When there is nothing
+    new, the matrix is touched to mark the store up to date.
+    """
+    if not os.path.exists(bits_path(prefix)):
+        build(prefix, files, nprocs)
+        return [d for d, _ in files]
+
+    store = PresenceStore(prefix)
+    ingested = set(store.dates)
+    new = [(d, path) for d, path in files if d not in ingested]
+    if not new:
+        os.utime(bits_path(prefix))
+        return []
+
+    index = {d: i for i, d in enumerate(store.domains)}
+    index, days = ingest.ingest([path for _, path in new], index=index, nprocs=nprocs)
+
+    old = store.bits
+    stride = old.shape[1]
+    if len(index) > stride * 8:
+        stride = max((len(index) + 7) // 8, stride + stride // 4)
+    rows = [pack_row(ids, stride) for ids in days]
+    last = store.dates[-1]
+    dates = sorted(store.dates + [d for d, _ in new])
+    del store
+    if new[0][0] < last:
+        eprint(f"{prefix}: {new[0][0]} is older than {last}, rewriting the matrix")
+        at = {d: i for i, d in enumerate(dates)}
+        regrow(prefix, old, rows, stride, [at[d] for d, _ in new])
+    elif stride != old.shape[1] or not write_rows(prefix, len(old), rows, stride):
+        regrow(prefix, old, rows, stride)
+    del old
+
+    write_lines(domains_path(prefix), index)
+    write_lines(dates_path(prefix), dates)
+    return [d for d, _ in new]
+
+class PresenceStore:
+    """
+    A read-only, memory-mapped view of a presence store.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        with open(domains_path(prefix), 'r', encoding='utf-8') as f:
+            self.domains = f.read().splitlines()
+        with open(dates_path(prefix), 'r') as f:
+            self.dates = f.read().splitlines()
+        self.bits = np.load(bits_path(prefix), mmap_mode="r")[:len(self.dates)]
+        self._ids = None
+
+    def __len__(self):
+        return len(self.domains)
+
+    def domain_id(self, domain):
+        """
+        Return the ID of domain, or None if it was never seen.
+        """
+        if self._ids is None:
+            self._ids = {d: i for i, d in enumerate(self.domains)}
+        return self._ids.get(domain)
+
+    def rows(self, start=0, stop=None):
+        """
+        Unpack rows [start, stop) into a (days, domains) uint8 0/1 matrix.
+        """
+        return np.unpackbits(self.bits[start:stop], axis=1, count=len(self.domains), bitorder="little")
+
+    def day(self, i):
+        """
+        Return the IDs of the domains present on the i-th ingested date.
+        """
+        return np.flatnonzero(self.rows(i, i + 1)[0])
+
+    def days_present(self):
+        """
+        Return, for every domain ID, the number of dates it was present on.
+        """
+        counts = np.zeros(len(self.domains), dtype=np.int64)
+        for start in range(0, len(self.dates), CHUNK_DAYS):
+            counts += self.rows(start, start + CHUNK_DAYS).sum(axis=0, dtype=np.int64)
+        return counts
+
+    def matrix(self):
+        """
+        Return the full (domains, days) uint8 0/1 matrix, one column per
+        ingested date.
+        """
+        return self.rows().T
+
+    def calendar(self):
+        """
+        Return (first_date, matrix), where matrix is (domains, days) with one
+        column per calendar day from the first to the last ingested date.
+        Days without a snapshot are all zeros.
+        """
+        first = date.fromisoformat(self.dates[0])
+        offsets = np.array([(date.fromisoformat(d) - first).days for d in self.dates])
+        matrix = np.zeros((len(self.domains), offsets[-1] + 1), dtype=np.uint8)
+        for start in range(0, len(self.dates), CHUNK_DAYS):
+            matrix[:, offsets[start:start + CHUNK_DAYS]] = self.rows(start, start + CHUNK_DAYS).T
+        return first, matrix
+
+if __name__ == '__main__':
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "haj:", ["help", "append", "jobs=", "gfw", "henan"])
+    except getopt.GetoptError as err:
+        eprint(err)
+        usage()
+        sys.exit(2)
+
+    append_mode = False
+    nprocs = None
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            usage()
+            sys.exit(0)
+        elif o in ("-a", "--append"):
+            append_mode = True
+        elif o in ("-j", "--jobs"):
+            nprocs = int(a)
+        elif o == "--gfw":
+            args = list(VANTAGE_POINTS["gfw"]) + args
+        elif o == "--henan":
+            args = list(VANTAGE_POINTS["henan"]) + args
+
+    if len(args) < 2:
+        usage()
+        sys.exit(2)
+
+    prefix, patterns = args[0], args[1:]
+    files = snapshot_files(patterns)
+    if not files:
+        eprint("No matching files found. Exiting.")
+        sys.exit(1)
+
+    if append_mode:
+        added = append(prefix, files, nprocs)
+        eprint(f"{prefix}: ingested {len(added)} new days")
+    else:
+        build(prefix, files, nprocs)
+        eprint(f"{prefix}: {len(files)} days, {files[0][0]} to {files[-1][0]}")
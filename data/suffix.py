@@ -0,0 +1,144 @@
+import atexit
+import fcntl
+import hashlib
+import os
+from functools import lru_cache
+
+import tldextract  # pip install tldextract
+
+# Shared domain-suffix parsing for the tools in this directory.
+#
+# extract() parses a domain against the Public Suffix List with tldextract.
+# Results are memoized twice: in process with an LRU cache, and across runs
+# in CACHE_PATH, a TSV of "domain<TAB>suffix<TAB>domain<TAB>subdomain" lines.
+# The cache file starts with the tldextract version and a hash of the suffix
+# list that produced it, and is discarded when either changes. Processes
+# running at the same time share it: readers take a shared lock on it and
+# the appends at exit an exclusive one.
+#
+# tld_parts() and last_labels() are the cheaper label-splitting rules that
+# the day-by-day files are sorted and grouped by; they do not consult the
+# Public Suffix List.
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "suffix-cache.tsv")
+
+LRU_SIZE = 1 << 16
+
+_disk_cache = None
+_unsaved = {}
+
+@lru_cache(maxsize=None)
+def cache_header():
+    """
+    Return the first line of a cache file written with the installed
+    tldextract and the suffix list it uses.
+    """
+    tlds = "\n".join(sorted(tldextract.tldextract.TLD_EXTRACTOR.tlds))
+    digest = hashlib.sha256(tlds.encode('utf-8')).hexdigest()[:16]
+    return f"# tldextract {tldextract.__version__} psl {digest}\n"
+
+def _load_disk_cache():
+    global _disk_cache
+    _disk_cache = {}
+    try:
+        with open(CACHE_PATH, 'r', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            if f.readline() != cache_header():
+                return
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) == 4:
+                    _disk_cache[fields[0]] = tuple(fields[1:])
+    except FileNotFoundError:
+        pass
+
+def save():
+    """
+    Append the entries parsed since the last save to CACHE_PATH, starting
+    it over if it is missing or stale. Called automatically at exit.
+    """
+    global _unsaved
+    if not _unsaved:
+        return
+    with open(CACHE_PATH, 'a+', encoding='utf-8') as f:
+        # Held until the file is closed, after the buffered lines are written.
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        if f.readline() != cache_header():
+            f.truncate(0)
+            f.write(cache_header())
+        for domain, parts in _unsaved.items():
+            f.write("\t".join((domain,) + parts) + "\n")
+    _unsaved = {}
+
+atexit.register(save)
+
+def _lookup(domain):
+    if _disk_cache is None:
+        _load_disk_cache()
+    parts = _disk_cache.get(domain)
+    if parts is None:
+        extracted = tldextract.extract(domain)
+        parts = (extracted.suffix, extracted.domain, extracted.subdomain)
+        _disk_cache[domain] = parts
+        _unsaved[domain] = parts
+    return parts
+
+@lru_cache(maxsize=LRU_SIZE)
+def extract(domain):
+    """
+    Return (suffix, domain, subdomain) of domain per the Public Suffix List,
+    e.g. "www.google.co.uk" => ("co.uk", "google", "www").
+    """
+    return _lookup(domain)
+
+def extract_many(domains):
+    """
+    Return extract() of every domain in an iterable (a list, a set, a
+    pandas Series or a NumPy array), parsing each distinct domain once.
+    """
+    domains = list(domains)
+    parts = {d: extract(d) for d in dict.fromkeys(domains)}
+    return [parts[d] for d in domains]
+
+def sort_domains(domains):
+    """
+    Sort domains by suffix, then registered domain, then subdomain.
+    """
+    domains = list(domains)
+    keys = extract_many(domains)
+    return [domains[i] for i in sorted(range(len(domains)), key=keys.__getitem__)]
+
+@lru_cache(maxsize=LRU_SIZE)
+def tld_parts(domain):
+    """
+    Return (root, full_tld) by splitting labels, e.g. "a.b.co.uk" =>
+    (".uk", "co.uk") and "example.com" => (".com", ".com"). Domains with a
+    single label give ("", "").
+    """
+    parts = domain.split('.')
+    if len(parts) < 2:
+        return "", ""
+    root = '.' + parts[-1]
+    full_tld = '.'.join(parts[-2:]) if len(parts) > 2 else root
+    return root, full_tld
+
+@lru_cache(maxsize=LRU_SIZE)
+def last_labels(domain):
+    """
+    Return the last two labels of domains with three or more labels and the
+    last label otherwise, e.g. "a.co.uk" => "co.uk", "example.com" => "com".
+    """
+    parts = domain.split(".")
+    if len(parts) >= 3:
+        return ".".join(parts[-2:])
+    return parts[-1]
+
+def last_labels_many(domains):
+    """
+    Return last_labels() of every domain in an iterable, splitting each
+    distinct domain once.
+    """
+    domains = list(domains)
+    labels = {d: last_labels(d) for d in dict.fromkeys(domains)}
+    return [labels[d] for d in domains]
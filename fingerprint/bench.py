@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import getopt
+import json
+import resource
+import subprocess
+import tempfile
+import time
+
+import extract
+import synth
+
+# Every measurement runs in a fresh interpreter, so that the peak RSS
+# reported by getrusage is that of one extraction alone.
+
+def usage(f=sys.stderr):
+    program = sys.argv[0]
+    f.write(f"""\
+Usage: {program} [OPTIONS]
+This script benchmarks extract.py on synthetic captures (see synth.py) of increasing size, and
+prints a table of the packets/s, sessions/s and peak RSS of extracting each one. It checks that
+every capture yields as many sessions as synth.py reset with an accepted RST.
+
+  -h, --help            show this help
+  -n, --sessions=N      number of sessions at scale 1 (default: 10000)
+  -s, --scales=LIST     comma-separated scales (default: 1,10,100)
+  -F, --format=LIST     comma-separated capture formats, pcap and/or pcapng (default: pcap)
+  -r, --repeat=N        extract each capture N times and report the fastest (default: 1)
+  -d, --dir=DIR         write the captures to DIR and keep them (default: a temporary directory)
+
+Example:
+  {program} --scales 1,10 --format pcap,pcapng
+""")
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+def measure(path):
+    """
+    Extract path in a child process. Return its seconds, number of
+    sessions and peak RSS in bytes.
+    """
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--measure", path],
+                         check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(out)
+
+def _measure(path):
+    start = time.perf_counter()
+    results = extract.extract_psh_rst_data_dpkt(path)
+    seconds = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS.
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        maxrss *= 1024
+    json.dump({'seconds': seconds, 'sessions': len(results), 'maxrss': maxrss}, sys.stdout)
+
+def bench(directory, sessions, scales, formats, repeat):
+    print("scale\tformat\tpackets\tsessions\tseconds\tpackets/s\tsessions/s\tpeak RSS (MiB)")
+    for scale in scales:
+        for format in formats:
+            path = os.path.join(directory, f"synthetic-{scale}x.{format}")
+            with open(path, 'wb') as f:
+                stats = synth.generate(f, n=sessions * scale, format=format)
+            runs = [measure(path) for _ in range(repeat)]
+            best = min(runs, key=lambda run: run['seconds'])
+            if best['sessions'] != stats['censored']:
+                eprint(f"{path}: extracted {best['sessions']} sessions, expected {stats['censored']}")
+            seconds = best['seconds']
+            print(f"{scale}\t{format}\t{stats['packets']}\t{stats['sessions']}\t{seconds:.3f}\t"
+                  f"{stats['packets'] / seconds:.0f}\t{stats['sessions'] / seconds:.0f}\t"
+                  f"{max(run['maxrss'] for run in runs) / 2**20:.1f}", flush=True)
+
+if __name__ == '__main__':
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "hn:s:F:r:d:",
+                                       ["help", "sessions=", "scales=", "format=", "repeat=", "dir=", "measure="])
+    except getopt.GetoptError as err:
+        eprint(err)
+        usage()
+        sys.exit(2)
+
+    sessions = 10000
+    scales = [1, 10, 100]
+    formats = ['pcap']
+    repeat = 1
+    directory = None
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            usage()
+            sys.exit(0)
+        elif o in ("-n", "--sessions"):
+            sessions = int(a)
+        elif o in ("-s", "--scales"):
+            scales = [int(x) for x in a.split(",")]
+        elif o in ("-F", "--format"):
+            formats = a.split(",")
+        elif o in ("-r", "--repeat"):
+            repeat = int(a)
+        elif o in ("-d", "--dir"):
+            directory = a
+        elif o == "--measure":
+            _measure(a)
+            sys.exit(0)
+
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        bench(directory, sessions, scales, formats, repeat)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            bench(tmp, sessions, scales, formats, repeat)
@@ -3,173 +3,526 @@
 
 import dpkt
 import socket
+import struct
+import numpy as np
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
+import getopt
 import glob
+import hashlib
+import os
+import pickle
+import sys
+from collections import OrderedDict
+from multiprocessing import Pool
 
-def is_from_firewall(ip):
+import pcapfile
+
+# The source addresses of the RSTs of the firewalls, unless a vantage point
+# is given its own with --firewall.
+FIREWALLS = ['1.1.1.1', '2.2.2.2']
+
+def firewall_addresses(ips):
+    """
+    Return the set of dotted-quad addresses as 32-bit integers.
+    """
+    return frozenset(struct.unpack('!I', socket.inet_aton(a))[0] for a in ips)
+
+FIREWALL_ADDRESSES = firewall_addresses(FIREWALLS)
+
+ETH_HEADER = struct.Struct('!12xH')
+VLAN_HEADER = struct.Struct('!2xH')
+# Version/IHL, total length, ID, flags/fragment offset, TTL, protocol,
+# source and destination address.
+IP_HEADER = struct.Struct('!B1xHHHBB2xII')
+# Ports, sequence and acknowledgment number, data offset and flags, window.
+TCP_HEADER = struct.Struct('!HHIIHH')
+
+ETH_TYPE_IP = 0x0800
+ETH_TYPES_VLAN = (0x8100, 0x88A8, 0x9100)
+ETH_TYPES_MPLS = (0x8847, 0x8848)
+
+def parse_tcp(buf):
+    """
+    Return (src, dst, sport, dport, seq, ack, flags, ttl, ip_id, ip_off,
+    window, payload) of a TCP/IPv4 packet in an Ethernet frame, where the
+    addresses are 32-bit integers, ip_off holds the IP flags and fragment
+    offset, and payload is a memoryview of the TCP payload in buf, or None
+    for any other packet.
+
+    Ethernet II frames, with up to two VLAN tags, are read at fixed offsets
+    without decoding; other frames are decoded with dpkt.
+    """
+    if len(buf) < 14:
+        return None
+    off = 14
+    eth_type, = ETH_HEADER.unpack_from(buf)
+    for _ in range(2):
+        if eth_type not in ETH_TYPES_VLAN or len(buf) < off + 4:
+            break
+        eth_type, = VLAN_HEADER.unpack_from(buf, off)
+        off += 4
+    if eth_type != ETH_TYPE_IP:
+        if eth_type > 1500 and eth_type not in ETH_TYPES_MPLS:
+            return None
+        # 802.3 and MPLS frames may still carry IPv4.
+        return parse_tcp_dpkt(buf)
+
+    if len(buf) < off + 20:
+        return None
+    v_hl, ip_len, ip_id, ip_off, ttl, p, src, dst = IP_HEADER.unpack_from(buf, off)
+    if p != dpkt.ip.IP_PROTO_TCP or ip_off & dpkt.ip.IP_OFFMASK:
+        return None
+    tcp_off = off + ((v_hl & 0xf) << 2)
+    if len(buf) < tcp_off + 20:
+        return None
+    sport, dport, seq, ack, off_flags, window = TCP_HEADER.unpack_from(buf, tcp_off)
+    start = tcp_off + ((off_flags >> 12) << 2)
+    # A zero total length is very likely due to TCP segmentation offload.
+    end = min(off + ip_len, len(buf)) if ip_len else len(buf)
+    return src, dst, sport, dport, seq, ack, off_flags & 0x1ff, ttl, ip_id, ip_off, window, memoryview(buf)[start:end]
+
+def parse_tcp_dpkt(buf):
+    """
+    Like parse_tcp, for frames that need dpkt to find the IP header.
+    """
+    try:
+        eth = dpkt.ethernet.Ethernet(bytes(buf))
+    except Exception:
+        return None
+    ip = eth.data
+    if not isinstance(ip, dpkt.ip.IP) or not isinstance(ip.data, dpkt.tcp.TCP):
+        return None
+    tcp = ip.data
+    src, = struct.unpack('!I', ip.src)
+    dst, = struct.unpack('!I', ip.dst)
+    return src, dst, tcp.sport, tcp.dport, tcp.seq, tcp.ack, tcp.flags, ip.ttl, ip.id, ip._flags_offset, \
+        tcp.win, memoryview(tcp.data)
+
+def is_from_firewall(src, firewalls=FIREWALL_ADDRESSES):
+    """
+    Check if the source IP, a 32-bit integer, is one of the firewall
+    addresses.
+    """
+    return src in firewalls
+
+TLS_HANDSHAKE = 0x16
+TLS_CLIENT_HELLO = 0x01
+TLS_EXT_SERVER_NAME = 0x0000
+
+def parse_sni(payload):
     """
-    Check if the source IP is one of the known firewall addresses.
-    Since dpkt stores IP addresses in binary, we convert them to strings.
+    Return the server name of a TLS ClientHello at the start of payload,
+    or None if there is none.
     """
-    src_ip = socket.inet_ntoa(ip.src)
-    return src_ip == '1.1.1.1' or src_ip == '2.2.2.2'
+    try:
+        if payload[0] != TLS_HANDSHAKE or payload[5] != TLS_CLIENT_HELLO:
+            return None
+        # Record header (5), handshake header (4), version (2), random (32).
+        i = 43
+        i += 1 + payload[i]                                   # session ID
+        i += 2 + int.from_bytes(payload[i:i + 2], 'big')      # cipher suites
+        i += 1 + payload[i]                                   # compression methods
+        end = min(i + 2 + int.from_bytes(payload[i:i + 2], 'big'), len(payload))
+        i += 2
+        while i + 4 <= end:
+            ext_type = int.from_bytes(payload[i:i + 2], 'big')
+            ext_len = int.from_bytes(payload[i + 2:i + 4], 'big')
+            i += 4
+            if ext_type == TLS_EXT_SERVER_NAME:
+                # List length (2), name type (1), name length (2), name.
+                name_len = int.from_bytes(payload[i + 3:i + 5], 'big')
+                name = bytes(payload[i + 5:i + 5 + name_len])
+                return name.decode('ascii', 'replace') if len(name) == name_len else None
+            i += ext_len
+    except IndexError:
+        pass
+    return None
 
-def get_session_key(ip, tcp):
+def ip_flags(ip_off):
+    """
+    Return the IP flags as in gfw.csv, e.g. "DF", or "".
+    """
+    return "+".join(name for name, bit in (('DF', dpkt.ip.IP_DF), ('MF', dpkt.ip.IP_MF)) if ip_off & bit)
+
+def get_session_key(src, dst, sport, dport):
     """
     Generate a unique session key for a TCP session.
-    The key is a tuple consisting of sorted source and destination IP addresses 
-    and sorted source and destination ports.
+    The key packs the sorted source and destination IP addresses and the
+    sorted source and destination ports into one integer.
     """
-    src_ip = socket.inet_ntoa(ip.src)
-    dst_ip = socket.inet_ntoa(ip.dst)
-    ips = tuple(sorted([src_ip, dst_ip]))
-    ports = tuple(sorted([tcp.sport, tcp.dport]))
-    return ips + ports
+    if src > dst:
+        src, dst = dst, src
+    if sport > dport:
+        sport, dport = dport, sport
+    return (((src << 32 | dst) << 16 | sport) << 16) | dport
 
-def extract_psh_rst_data_dpkt(filename):
+# A session that has seen no packet for this many seconds of capture time
+# is evicted. Its PSH can no longer be answered by a RST that counts.
+IDLE_TIMEOUT = 120
+
+class Session:
     """
+    The state of one TCP session: the order it was first seen in, its
+    latest PSH and the SNI of its latest ClientHello. The payload itself
+    is not kept, only its length.
     """
-    sessions = {}  # Container for session information.
-    
-    with open(filename, 'rb') as f:
+    __slots__ = ('first', 'last_seen', 'last_psh', 'psh_len', 'psh_seq', 'psh_ack', 'sni')
+
+    def __init__(self, first, ts):
+        self.first = first
+        self.last_seen = ts
+        self.last_psh = None
+        self.psh_len = None
+        self.psh_seq = None
+        self.psh_ack = None
+        self.sni = None
+
+def extract_psh_rst_data_dpkt(filename, firewalls=FIREWALL_ADDRESSES, idle_timeout=IDLE_TIMEOUT):
+    """
+    Return, for every TCP session of a pcap whose latest PSH was answered
+    by a RST from one of the firewalls that Linux would accept, the time
+    from the PSH to the RST and the fingerprint features of the RST, in
+    the order the sessions were first seen.
+
+    Sessions are tracked in a table ordered by last activity. A session is
+    emitted and evicted on its first qualifying RST, as that RST is the one
+    that tears the connection down, and evicted without output once idle
+    for idle_timeout seconds, so memory is bounded by the number of
+    concurrent sessions rather than the size of the capture.
+    """
+    sessions = OrderedDict()  # Session key => Session, least recently active first.
+    results = []
+    first = 0
+
+    try:
+        pcap = pcapfile.open(filename)
+    except (OSError, ValueError) as e:
+        print("Error reading pcap file:", filename, e)
+        return []
+
+    with pcap:
+        # Timestamps are integer nanoseconds, so that deltas are exact.
+        idle_timeout_ns = int(idle_timeout * 10 ** 9)
         try:
-            pcap = dpkt.pcap.Reader(f)
-        except Exception as e:
-            print("Error reading pcap file:", filename, e)
-            return []
-        
-        for ts, buf in pcap:
-            # Parse the Ethernet frame.
-            try:
-                eth = dpkt.ethernet.Ethernet(buf)
-            except Exception:
-                continue
-            
-            # Process only IP packets.
-            if not isinstance(eth.data, dpkt.ip.IP):
-                continue
-            ip = eth.data
-            
-            # Process only TCP packets.
-            if ip.p != dpkt.ip.IP_PROTO_TCP:
-                continue
-            tcp = ip.data
+            for ts, buf in pcap.packets(ns=True):
+                # Process only TCP/IPv4 packets.
+                packet = parse_tcp(buf)
+                if packet is None:
+                    continue
+                src, dst, sport, dport, seq, ack, flags, ttl, ip_id, ip_off, window, payload = packet
+
+                # Evict idle sessions.
+                while sessions:
+                    oldest = next(iter(sessions.values()))
+                    if ts - oldest.last_seen <= idle_timeout_ns:
+                        break
+                    sessions.popitem(last=False)
             
-            # Obtain a unique session key.
-            session_key = get_session_key(ip, tcp)
-            if session_key not in sessions:
-                sessions[session_key] = {
-                    'last_psh': None,
-                    'latest_rst': None,
-                    'psh_data': None,
-                    'psh_seq': None,
-                    'psh_ack': None,
-                    'rst_seq': None,
-                    'rst_ack': None
-                }
+                # Obtain a unique session key.
+                session_key = get_session_key(src, dst, sport, dport)
+                session = sessions.get(session_key)
+                if session is None:
+                    session = sessions[session_key] = Session(first, ts)
+                    first += 1
+                else:
+                    sessions.move_to_end(session_key)
+                    session.last_seen = max(session.last_seen, ts)
             
-            # Process PSH packet: flag 0x08 (TH_PUSH).
-            if tcp.flags & dpkt.tcp.TH_PUSH:
-                # Update if this packet has a later timestamp.
-                if sessions[session_key]['last_psh'] is None or ts > sessions[session_key]['last_psh']:
-                    sessions[session_key]['last_psh'] = ts
-                    sessions[session_key]['psh_data'] = tcp.data    # Save TCP payload.
-                    sessions[session_key]['psh_seq'] = tcp.seq      # Save TCP sequence number.
-                    sessions[session_key]['psh_ack'] = tcp.ack      # Save TCP acknowledgment number.
+                # Process PSH packet: flag 0x08 (TH_PUSH).
+                if flags & dpkt.tcp.TH_PUSH:
+                    # Update if this packet has a later timestamp.
+                    if session.last_psh is None or ts > session.last_psh:
+                        session.last_psh = ts
+                        session.psh_len = len(payload)   # Save TCP payload length.
+                        session.psh_seq = seq            # Save TCP sequence number.
+                        session.psh_ack = ack            # Save TCP acknowledgment number.
+                        if payload and payload[0] == TLS_HANDSHAKE:
+                            session.sni = parse_sni(payload) or session.sni
             
-            # Process RST packet: flag 0x04 (TH_RST).
-            if tcp.flags & dpkt.tcp.TH_RST:
-                # Only consider RST packets from the designated firewall.
-                if not is_from_firewall(ip):
-                    continue
-                if sessions[session_key]['latest_rst'] is None or ts > sessions[session_key]['latest_rst']:
-                    sessions[session_key]['latest_rst'] = ts
-                    sessions[session_key]['rst_seq'] = tcp.seq      # Save TCP sequence number.
-                    sessions[session_key]['rst_ack'] = tcp.ack      # Save TCP acknowledgment number.
-    
-    # Prepare a list of results for sessions that have both PSH and RST packets.
-    results = []
-    for key, times in sessions.items():
-        last_psh = times['last_psh']
-        latest_rst = times['latest_rst']
-        psh_data = times['psh_data']
-        # Only include sessions where both PSH and RST exist and RST occurs at/after PSH.
-        if last_psh is not None and latest_rst is not None and latest_rst >= last_psh and psh_data is not None:
-            # Linux will drop a connection if the RST’s ack number exactly equals:
-            # the PSH packet’s sequence number plus the length of its payload.
-            expected_rst_ack = times['psh_seq'] + len(psh_data)
-            # If the RST’s ack does not match, it means Linux would ignore that reset.
-            if times['rst_ack'] != expected_rst_ack:
-                continue  # Skip this stream.
-            diff_seconds = float(latest_rst - last_psh)  # Time difference in seconds.
-            results.append({
-                'time_diff': diff_seconds,
-                'psh_data': psh_data,
-                'psh_seq': times['psh_seq'],
-                'psh_ack': times['psh_ack'],
-                'rst_seq': times['rst_seq'],
-                'rst_ack': times['rst_ack'],
-                'file_name': filename
-            })
-    return results
-
-
-guangzhou_files = glob.glob('../pcap/1m_sni_censorship_guangzhou-1_ts_0_2023-*-*.pcap')
-california_files = glob.glob('../pcap/1m_sni_censorship_california-1_ts_1_2023-*-*.pcap')
-
-psh_rst_data_henan = []
-psh_rst_data_gfw = []
-
-# Process Guangzhou files (e.g., Henan Firewall traffic).
-for filename in guangzhou_files:
-    print(f"Processing file: {filename}")
-    psh_rst_data_henan.extend(extract_psh_rst_data_dpkt(filename))
-
-# Process California files (e.g., GFW traffic).
-for filename in california_files:
-    print(f"Processing file: {filename}")
-    psh_rst_data_gfw.extend(extract_psh_rst_data_dpkt(filename))
-
-# For plotting, extract the time differences.
-time_diffs_henan = [entry['time_diff'] for entry in psh_rst_data_henan]
-time_diffs_gfw = [entry['time_diff'] for entry in psh_rst_data_gfw]
-
-# Create DataFrames including all desired fields.
-df_henan = pd.DataFrame({
-    'delta': time_diffs_henan,
-    # 'psh_data': [entry['psh_data'] for entry in psh_rst_data_henan],
-    # 'psh_seq': [entry['psh_seq'] for entry in psh_rst_data_henan],
-    # 'psh_ack': [entry['psh_ack'] for entry in psh_rst_data_henan],
-    # 'rst_seq': [entry['rst_seq'] for entry in psh_rst_data_henan],
-    # 'rst_ack': [entry['rst_ack'] for entry in psh_rst_data_henan],
-    'file_name': [entry['file_name'] for entry in psh_rst_data_henan]
-})
-df_gfw = pd.DataFrame({
-    'delta': time_diffs_gfw,
-    # 'psh_data': [entry['psh_data'] for entry in psh_rst_data_gfw],
-    # 'psh_seq': [entry['psh_seq'] for entry in psh_rst_data_gfw],
-    # 'psh_ack': [entry['psh_ack'] for entry in psh_rst_data_gfw],
-    # 'rst_seq': [entry['rst_seq'] for entry in psh_rst_data_gfw],
-    # 'rst_ack': [entry['rst_ack'] for entry in psh_rst_data_gfw],
-    # 'file_name': [entry['file_name'] for entry in psh_rst_data_gfw]
-})
-
-# -------------------------------
-# Plotting the ECDF
-# -------------------------------
-# sns.set_style('whitegrid')
-# ax = sns.ecdfplot(data=df_henan, x='time_diff', label='Henan Firewall', log_scale=(True))
-# ax = sns.ecdfplot(data=df_gfw, x='time_diff', label='GFW', log_scale=(True))
-# ax.set(xlim=(None, 1))
-# plt.title('CDF of Time Difference (PSH to RST) in Seconds')
-# plt.xlabel('Seconds')
-# plt.ylabel('CDF')
-# plt.legend()
-# plt.show()
-
-
-# Save the DataFrames to CSV files for further analysis if needed.
-df_henan.to_csv('henan_delta.csv', index=False)
-df_gfw.to_csv('gfw_delta.csv', index=False)
+                # Process RST packet: flag 0x04 (TH_RST).
+                if flags & dpkt.tcp.TH_RST:
+                    # Only consider RST packets from the designated firewall.
+                    if not is_from_firewall(src, firewalls):
+                        continue
+                    # Only consider RSTs at/after the PSH.
+                    if session.last_psh is None or ts < session.last_psh:
+                        continue
+                    # Linux will drop a connection if the RST’s ack number exactly equals:
+                    # the PSH packet’s sequence number plus the length of its payload.
+                    # If the RST’s ack does not match, Linux would ignore that reset.
+                    if ack != session.psh_seq + session.psh_len:
+                        continue
+                    diff_seconds = (ts - session.last_psh) / 10 ** 9  # Time difference in seconds.
+                    results.append((session.first, {
+                        'time_diff': diff_seconds,
+                        'psh_len': session.psh_len,
+                        'psh_seq': session.psh_seq,
+                        'psh_ack': session.psh_ack,
+                        'rst_seq': seq,
+                        'rst_ack': ack,
+                        'sni': session.sni,
+                        'payload': payload.hex(),
+                        'ttl': ttl,
+                        'ip_flags': ip_flags(ip_off),
+                        'ip_id': ip_id,
+                        'window': window,
+                        'file_name': filename
+                    }))
+                    del sessions[session_key]
+        except ValueError as e:
+            # A corrupt block: keep the sessions emitted before it.
+            print("Error reading pcap file:", filename, e)
+
+    results.sort(key=lambda r: r[0])
+    return [r for _, r in results]
+
+
+# Columns of the per-file results, in the compact form that worker
+# processes send back: one NumPy array per field.
+COLUMNS = [
+    ('time_diff', np.float64),
+    ('psh_len', np.int64),
+    ('psh_seq', np.int64),
+    ('psh_ack', np.int64),
+    ('rst_seq', np.int64),
+    ('rst_ack', np.int64),
+    ('sni', object),
+    ('payload', object),
+    ('ttl', np.int64),
+    ('ip_flags', object),
+    ('ip_id', np.int64),
+    ('window', np.int64),
+]
+
+# Columns of the fingerprint files, in order: the SNI, the PSH to RST delta
+# and the features of the RST, as in gfw.csv, then the rest.
+FINGERPRINT_COLUMNS = ['sni', 'delta', 'payload', 'ttl', 'ip_flags', 'ip_id', 'window',
+                       'psh_len', 'psh_seq', 'psh_ack', 'rst_seq', 'rst_ack', 'file_name']
+
+# Results are cached per pcap in a directory given with --cache, one pickle
+# per pcap, named after the hash of its absolute path. An entry is used
+# while the pcap has the same size, mtime and sampled hash, and was made
+# by the same extractor (the hash of this file and of the modules it reads
+# pcaps with) with the same settings.
+CACHE_SAMPLES = 16
+CACHE_SAMPLE_SIZE = 64 * 1024
+
+def _source_hash():
+    h = hashlib.blake2b(digest_size=16)
+    for module in (__file__, pcapfile.__file__):
+        with open(os.path.abspath(module), 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+EXTRACTOR_HASH = _source_hash()
+
+def sampled_hash(filename, size):
+    """
+    Return a hash of the size and of CACHE_SAMPLES evenly spaced blocks of
+    a file, including its first and last, without reading all of it.
+    """
+    h = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(filename, 'rb') as f:
+        span = max(size - CACHE_SAMPLE_SIZE, 0)
+        for i in range(CACHE_SAMPLES):
+            f.seek(span * i // (CACHE_SAMPLES - 1))
+            h.update(f.read(CACHE_SAMPLE_SIZE))
+    return h.hexdigest()
+
+def cache_path(cache_dir, filename):
+    name = hashlib.blake2b(os.path.abspath(filename).encode(), digest_size=16).hexdigest()
+    return os.path.join(cache_dir, name + ".pkl")
+
+def cache_key(filename, firewalls):
+    st = os.stat(filename)
+    return {
+        'path': os.path.abspath(filename),
+        'size': st.st_size,
+        'mtime': st.st_mtime_ns,
+        'hash': sampled_hash(filename, st.st_size),
+        'extractor': EXTRACTOR_HASH,
+        'firewalls': sorted(firewalls),
+        'idle_timeout': IDLE_TIMEOUT,
+    }
+
+def read_cache(path, key):
+    """
+    Return the cached columns at path if they were made for key, or None.
+    """
+    try:
+        with open(path, 'rb') as f:
+            entry = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    return entry['columns'] if entry.get('key') == key else None
+
+def write_cache(path, key, columns):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'key': key, 'columns': columns}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+def extract_columns(job):
+    """
+    Return (columns, cached) for one (filename, firewalls, cache_dir,
+    rebuild) job: the results as a dict of column arrays, and whether they
+    came from the cache.
+    """
+    filename, firewalls, cache_dir, rebuild = job
+    if cache_dir:
+        key = cache_key(filename, firewalls)
+        path = cache_path(cache_dir, filename)
+        columns = None if rebuild else read_cache(path, key)
+        if columns is not None:
+            return columns, True
+    results = extract_psh_rst_data_dpkt(filename, firewalls)
+    columns = {name: np.fromiter((entry[name] for entry in results), dtype=dtype, count=len(results))
+               for name, dtype in COLUMNS}
+    if cache_dir:
+        write_cache(path, key, columns)
+    return columns, False
+
+def _extract_all(jobs, nprocs):
+    if nprocs <= 1 or len(jobs) <= 1:
+        yield from map(extract_columns, jobs)
+    else:
+        with Pool(min(nprocs, len(jobs))) as pool:
+            yield from pool.imap(extract_columns, jobs)
+
+def extract_files(filenames, nprocs=1, firewalls=FIREWALL_ADDRESSES, cache_dir=None, rebuild=False):
+    """
+    Return the results of the pcaps as one dict of column arrays plus a
+    'file_name' column, in the order of filenames. With nprocs > 1, the
+    files are distributed over a process pool; the output is the same as
+    with a single process. With cache_dir, the results of unchanged pcaps
+    are read from the cache, and those of the others are stored in it;
+    with rebuild, all are extracted and stored again.
+    """
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    parts = []
+    jobs = [(filename, firewalls, cache_dir, rebuild) for filename in filenames]
+    for filename, (columns, cached) in zip(filenames, _extract_all(jobs, nprocs)):
+        print(f"{'Cached' if cached else 'Processed'} file: {filename}")
+        columns['file_name'] = np.full(len(columns['time_diff']), filename, dtype=object)
+        parts.append(columns)
+    return {name: np.concatenate([part[name] for part in parts]) if parts else np.zeros(0, dtype=dtype)
+            for name, dtype in COLUMNS + [('file_name', object)]}
+
+def usage(f=sys.stderr):
+    program = sys.argv[0]
+    f.write(f"""\
+Usage: {program} [OPTIONS]
+This script extracts the fingerprint of every censored TCP session in the pcaps of each vantage
+point, in one pass per pcap: the SNI of the ClientHello, the time from the last PSH to the
+firewall RST, and the TTL, IP flags, IP ID, window and payload of the RST. It writes them to
+DIR/NAME.parquet for every vantage point NAME.
+
+  -h, --help            show this help
+  -v, --vantage=NAME=GLOB
+                        the pcaps of vantage point NAME (may be given more than once; default:
+                        henan={GUANGZHOU_FILES},
+                        gfw={CALIFORNIA_FILES})
+  -f, --firewall=NAME=IP[,IP...]
+                        the source addresses of the RSTs of the firewall seen from vantage point
+                        NAME (default: {",".join(FIREWALLS)})
+  -g, --guangzhou=GLOB  same as --vantage henan=GLOB
+  -c, --california=GLOB same as --vantage gfw=GLOB
+  -o, --out-dir=DIR     write to DIR (default: .)
+  -d, --delta           also write the deltas to DIR/NAME_delta.csv, for plot.py
+  -j, --jobs=N          process N pcaps in parallel (default: one per CPU); the output does not
+                        depend on N
+  -C, --cache=DIR       keep the results of every pcap in DIR, and only process the pcaps that
+                        are new or changed since; a change to this script or to pcapfile.py
+                        invalidates the cache
+  --rebuild             process all pcaps and replace their entries in the cache
+
+Writing Parquet requires pyarrow.
+
+Example:
+  {program} --vantage henan='../pcap/*guangzhou*.pcap' --vantage gfw='../pcap/*california*.pcap' --firewall gfw=1.1.1.1 --jobs 8
+""")
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+GUANGZHOU_FILES = '../pcap/1m_sni_censorship_guangzhou-1_ts_0_2023-*-*.pcap'
+CALIFORNIA_FILES = '../pcap/1m_sni_censorship_california-1_ts_1_2023-*-*.pcap'
+
+def fingerprint_frame(columns):
+    """
+    Return the fingerprint DataFrame of the columns of extract_files().
+    """
+    df = pd.DataFrame(columns).rename(columns={'time_diff': 'delta'})
+    return df[FINGERPRINT_COLUMNS]
+
+def split_option(a):
+    name, sep, value = a.partition("=")
+    if not sep or not name:
+        raise ValueError(f"expected NAME=VALUE: {a}")
+    return name, value
+
+if __name__ == '__main__':
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "hv:f:g:c:o:dj:C:",
+                                       ["help", "vantage=", "firewall=", "guangzhou=", "california=", "out-dir=", "delta", "jobs=",
+                                        "cache=", "rebuild"])
+    except getopt.GetoptError as err:
+        eprint(err)
+        usage()
+        sys.exit(2)
+
+    vantages = {}
+    firewalls = {}
+    out_dir = "."
+    write_delta = False
+    cache_dir = None
+    rebuild = False
+    nprocs = os.cpu_count() or 1
+    try:
+        for o, a in opts:
+            if o in ("-h", "--help"):
+                usage()
+                sys.exit(0)
+            elif o in ("-v", "--vantage"):
+                name, pattern = split_option(a)
+                vantages[name] = pattern
+            elif o in ("-f", "--firewall"):
+                name, ips = split_option(a)
+                firewalls[name] = firewall_addresses(ips.split(","))
+            elif o in ("-g", "--guangzhou"):
+                vantages['henan'] = a
+            elif o in ("-c", "--california"):
+                vantages['gfw'] = a
+            elif o in ("-o", "--out-dir"):
+                out_dir = a
+            elif o in ("-d", "--delta"):
+                write_delta = True
+            elif o in ("-j", "--jobs"):
+                nprocs = int(a)
+            elif o in ("-C", "--cache"):
+                cache_dir = a
+            elif o == "--rebuild":
+                rebuild = True
+    except (ValueError, OSError) as err:
+        eprint(err)
+        usage()
+        sys.exit(2)
+
+    if not vantages:
+        vantages = {'henan': GUANGZHOU_FILES, 'gfw': CALIFORNIA_FILES}
+    unknown = set(firewalls) - set(vantages)
+    if unknown:
+        eprint(f"--firewall for unknown vantage points: {', '.join(sorted(unknown))}")
+        sys.exit(2)
+
+    for name, pattern in vantages.items():
+        filenames = glob.glob(pattern)
+        columns = extract_files(filenames, nprocs, firewalls.get(name, FIREWALL_ADDRESSES), cache_dir, rebuild)
+        df = fingerprint_frame(columns)
+        eprint(f"{name}: {len(df)} sessions from {len(filenames)} pcaps")
+
+        df.to_parquet(os.path.join(out_dir, f"{name}.parquet"), index=False)
+        if write_delta:
+            # For further analysis if needed, and for plot.py.
+            df[['delta', 'file_name']].to_csv(os.path.join(out_dir, f"{name}_delta.csv"), index=False)
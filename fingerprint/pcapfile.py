@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+
+import sys
+import builtins
+import getopt
+import mmap
+import struct
+
+# A reader of classic pcap and pcapng captures that memory-maps the file
+# and yields every packet as a memoryview into the map, without copying.
+#
+#   with pcapfile.open(path) as pcap:
+#       for ts, buf in pcap:
+#           ...
+#
+# ts is the capture time in seconds, as a float, like dpkt's readers give
+# it; pcap.packets(ns=True) yields integer nanoseconds instead, exact for
+# nanosecond captures. The views are only valid until the reader is
+# closed: copy with bytes(buf) whatever must outlive it.
+
+PCAP_MAGIC = 0xA1B2C3D4
+PCAP_MAGIC_NANO = 0xA1B23C4D
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+
+PCAPNG_IDB = 0x00000001
+PCAPNG_PB = 0x00000002
+PCAPNG_SPB = 0x00000003
+PCAPNG_EPB = 0x00000006
+
+PCAPNG_OPT_ENDOFOPT = 0
+PCAPNG_OPT_IF_TSRESOL = 9
+PCAPNG_OPT_IF_TSOFFSET = 14
+
+def usage(f=sys.stderr):
+    program = sys.argv[0]
+    f.write(f"""\
+Usage: {program} [OPTIONS] FILE...
+This script prints the format, link types and number of packets of pcap and pcapng captures.
+
+  -h, --help            show this help
+
+Example:
+  {program} ../pcap/*.pcap
+""")
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+def _tsresol(value):
+    """
+    Return the number of timestamp units per second of an if_tsresol
+    option value: 10^value, or 2^(value & 0x7f) if the top bit is set.
+    """
+    return 2 ** (value & 0x7f) if value & 0x80 else 10 ** value
+
+class Interface:
+    """
+    A pcapng interface: its link type and timestamp resolution and offset.
+    """
+    __slots__ = ('linktype', 'units', 'offset')
+
+    def __init__(self, linktype, units=10 ** 6, offset=0):
+        self.linktype = linktype
+        self.units = units
+        self.offset = offset
+
+class Reader:
+    """
+    A memory-mapped pcap or pcapng capture. Iterating yields (ts, buf)
+    for every packet, where buf is a memoryview of the captured bytes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with builtins.open(path, 'rb') as f:
+            try:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f"{path}: empty file")
+        self._buf = memoryview(self._mm)
+        if len(self._buf) < 4:
+            self.close()
+            raise ValueError(f"{path}: truncated header")
+        magic_le, = struct.unpack_from('<I', self._buf)
+        magic_be, = struct.unpack_from('>I', self._buf)
+        if PCAP_MAGIC in (magic_le, magic_be) or PCAP_MAGIC_NANO in (magic_le, magic_be):
+            self.format = 'pcap'
+            self._packets = self._pcap_packets
+            self._pcap_header()
+        elif magic_le == PCAPNG_SHB:
+            self.format = 'pcapng'
+            self._packets = self._pcapng_packets
+            self.linktypes = []
+        else:
+            self.close()
+            raise ValueError(f"{path}: not a pcap or pcapng file")
+
+    def _pcap_header(self):
+        if len(self._buf) < 24:
+            self.close()
+            raise ValueError(f"{self.path}: truncated header")
+        magic, = struct.unpack_from('<I', self._buf)
+        self._order = '<' if magic in (PCAP_MAGIC, PCAP_MAGIC_NANO) else '>'
+        magic, _, _, _, _, self.snaplen, linktype = struct.unpack_from(self._order + 'IHHiIII', self._buf)
+        # The upper bits may carry the FCS length.
+        self.linktype = linktype & 0xffff
+        self.linktypes = [self.linktype]
+        self._units = 10 ** 9 if magic == PCAP_MAGIC_NANO else 10 ** 6
+
+    def _pcap_packets(self):
+        buf = self._buf
+        header = struct.Struct(self._order + 'IIII')
+        units = self._units
+        off = 24
+        end = len(buf)
+        while off + 16 <= end:
+            sec, frac, caplen, _ = header.unpack_from(buf, off)
+            off += 16
+            if off + caplen > end:
+                break  # Truncated last packet, e.g. a capture still being written.
+            yield sec, frac, units, 0, buf[off:off + caplen]
+            off += caplen
+
+    def _pcapng_options(self, body, off, end, order, interface):
+        while off + 4 <= end:
+            code, length = struct.unpack_from(order + 'HH', body, off)
+            off += 4
+            if code == PCAPNG_OPT_ENDOFOPT:
+                break
+            if code == PCAPNG_OPT_IF_TSRESOL and length >= 1:
+                interface.units = _tsresol(body[off])
+            elif code == PCAPNG_OPT_IF_TSOFFSET and length >= 8:
+                interface.offset, = struct.unpack_from(order + 'q', body, off)
+            off += (length + 3) & ~3
+
+    def _interface(self, interfaces, if_id, off):
+        if if_id >= len(interfaces):
+            raise ValueError(f"{self.path}: packet at offset {off} references undeclared interface {if_id}")
+        return interfaces[if_id]
+
+    def _pcapng_packets(self):
+        buf = self._buf
+        end = len(buf)
+        off = 0
+        order = '<'
+        interfaces = []
+        self.linktypes = []
+        while off + 12 <= end:
+            block_type, = struct.unpack_from('<I', buf, off)
+            if block_type == PCAPNG_SHB:
+                # A new section, with its own byte order and interfaces.
+                bom, = struct.unpack_from('<I', buf, off + 8)
+                order = '<' if bom == PCAPNG_BYTE_ORDER_MAGIC else '>'
+                interfaces = []
+            else:
+                block_type, = struct.unpack_from(order + 'I', buf, off)
+            length, = struct.unpack_from(order + 'I', buf, off + 4)
+            if length < 12 or off + length > end:
+                break  # Truncated or corrupt block.
+            body_end = off + length - 4
+
+            if block_type == PCAPNG_IDB:
+                linktype, = struct.unpack_from(order + 'H', buf, off + 8)
+                interface = Interface(linktype)
+                self._pcapng_options(buf, off + 16, body_end, order, interface)
+                interfaces.append(interface)
+                self.linktypes.append(linktype)
+            elif block_type == PCAPNG_EPB:
+                if_id, ts_high, ts_low, caplen = struct.unpack_from(order + 'IIII', buf, off + 8)
+                start = off + 28
+                interface = self._interface(interfaces, if_id, off)
+                units = ts_high << 32 | ts_low
+                yield units // interface.units, units % interface.units, interface.units, interface.offset, \
+                    buf[start:min(start + caplen, body_end)]
+            elif block_type == PCAPNG_PB:
+                if_id, _, ts_high, ts_low, caplen = struct.unpack_from(order + 'HHIII', buf, off + 8)
+                start = off + 28
+                interface = self._interface(interfaces, if_id, off)
+                units = ts_high << 32 | ts_low
+                yield units // interface.units, units % interface.units, interface.units, interface.offset, \
+                    buf[start:min(start + caplen, body_end)]
+            # Simple packet blocks have no timestamp and are skipped, as
+            # are name resolution, statistics and custom blocks.
+            off += length
+
+    def packets(self, ns=False):
+        """
+        Yield (ts, buf) for every packet. ts is in seconds as a float, or
+        in integer nanoseconds with ns.
+        """
+        if ns:
+            for sec, frac, units, offset, buf in self._packets():
+                yield (sec + offset) * 10 ** 9 + frac * 10 ** 9 // units, buf
+        else:
+            for sec, frac, units, offset, buf in self._packets():
+                yield offset + sec + frac / units, buf
+
+    def __iter__(self):
+        return self.packets()
+
+    def close(self):
+        self._buf.release()
+        try:
+            self._mm.close()
+        except BufferError:
+            # Views of packets are still alive; the map is unmapped once
+            # they are collected.
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open(path):
+    """
+    Open a pcap or pcapng capture. Raise ValueError if it is neither.
+    """
+    return Reader(path)
+
+if __name__ == '__main__':
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "h", ["help"])
+    except getopt.GetoptError as err:
+        eprint(err)
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            usage()
+            sys.exit(0)
+
+    if not args:
+        usage()
+        sys.exit(2)
+
+    for path in args:
+        try:
+            with open(path) as pcap:
+                count = sum(1 for _ in pcap)
+                linktypes = ",".join(str(t) for t in sorted(set(pcap.linktypes)))
+                print(f"{path}\t{pcap.format}\t{linktypes}\t{count}")
+        except (OSError, ValueError) as err:
+            eprint(err)
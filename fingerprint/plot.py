@@ -29,8 +29,8 @@ This script reads from CSV files and plot . With no FILE, or when FILE is -, rea
   -h, --help            show this help
   -o, --out             write to file (default: figure.pdf)
   -n, --no-show         do not show the plot, just save as file
-  -g, --gfw             GFW CSV file
-  -k, --henan           Henan Firewall CSV file
+  -g, --gfw             GFW CSV or Parquet file
+  -k, --henan           Henan Firewall CSV or Parquet file
   -t, --threshold       max second threshold of delay to be considered as a valid (default: 30)
 
 Example:
@@ -54,6 +54,15 @@ def input_files(args, binary=False):
                     with open(path, MODE) as f:
                         yield f
 
+def read_delta(filename):
+    """
+    Read the delta column of a CSV file, or of a Parquet file written by
+    extract.py.
+    """
+    if filename.endswith(".parquet"):
+        return pd.read_parquet(filename, columns=['delta'])
+    return pd.read_csv(filename, usecols=['delta'])
+
 
 if __name__ == '__main__':
     try:
@@ -88,8 +97,8 @@ if __name__ == '__main__':
         usage()
         sys.exit(2)
 
-    gfw_df = pd.read_csv(gfw_filename, usecols=['delta'])
-    henan_df = pd.read_csv(henan_filename, usecols=['delta'])
+    gfw_df = read_delta(gfw_filename)
+    henan_df = read_delta(henan_filename)
 
     # filter any row's delta that is greater than 30 s
     gfw_df = gfw_df[gfw_df['delta'] < threshold]
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+
+import sys
+import getopt
+import heapq
+import random
+import socket
+import struct
+
+# Writes synthetic captures of censored and uncensored TLS sessions, shaped
+# like the ones extract.py reads, for benchmarks and regression checks
+# without the real pcaps.
+#
+# Every session is a handshake, a PSH carrying a ClientHello, and then
+# either the server's response or one or more RSTs from the firewall,
+# spoofing the server. One of the RSTs acknowledges the ClientHello
+# exactly, so that Linux would accept it; the others, if any, are off by
+# one. Sessions start at a fixed interval and their packets overlap in
+# time, and the packets of all sessions are written in timestamp order.
+
+ETH_HEADER = struct.Struct('!6s6sH')
+IP_HEADER = struct.Struct('!BBHHHBBH4s4s')
+TCP_HEADER = struct.Struct('!HHIIHHHH')
+
+TH_FIN, TH_SYN, TH_RST, TH_PUSH, TH_ACK = 0x01, 0x02, 0x04, 0x08, 0x10
+IP_DF = 0x4000
+
+PCAP_MAGIC = 0xA1B2C3D4
+PCAP_MAGIC_NANO = 0xA1B23C4D
+
+DELAYS = ('exp', 'lognormal', 'uniform', 'fixed')
+
+def usage(f=sys.stderr):
+    program = sys.argv[0]
+    f.write(f"""\
+Usage: {program} [OPTIONS] FILE
+This script writes a synthetic capture of TLS sessions to FILE, some of them reset by a firewall,
+for benchmarking extract.py. It prints the number of packets, sessions and sessions that
+extract.py should report to stderr.
+
+  -h, --help            show this help
+  -n, --sessions=N      number of sessions (default: 10000)
+  -c, --censored=P      fraction of sessions reset by the firewall (default: 0.8)
+  -w, --wrong-ack=P     fraction of censored sessions whose accepted RST is preceded by one
+                        with a wrong ack (default: 0.2)
+  -r, --rsts=N          RSTs per censored session, the first accepted one included
+                        (default: 1); the others have wrong acks
+  -d, --delay=DIST      distribution of the PSH to RST delay: {", ".join(DELAYS)} (default: exp)
+  -m, --mean=MS         mean PSH to RST delay in milliseconds (default: 20)
+  -i, --interval=MS     time between the starts of consecutive sessions (default: 1)
+  -f, --firewall=IP     address of the server, which the firewall spoofs (default: 1.1.1.1)
+  -F, --format=FORMAT   pcap or pcapng (default: pcap)
+  --nano                nanosecond timestamps
+  -s, --seed=N          random seed (default: 0)
+
+Example:
+  {program} --sessions 100000 --format pcapng synthetic.pcapng
+""")
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+def client_hello(sni):
+    """
+    Return a minimal TLS 1.2 record with a ClientHello for sni.
+    """
+    name = sni.encode('ascii')
+    server_name = struct.pack('!HBH', len(name) + 3, 0, len(name)) + name
+    extensions = struct.pack('!HH', 0x0000, len(server_name)) + server_name
+    body = b'\x03\x03' + bytes(32) + b'\x00' + struct.pack('!H', 2) + b'\x13\x01' + b'\x01\x00' + \
+        struct.pack('!H', len(extensions)) + extensions
+    handshake = b'\x01' + len(body).to_bytes(3, 'big') + body
+    return b'\x16\x03\x01' + struct.pack('!H', len(handshake)) + handshake
+
+def packet(src, dst, sport, dport, flags, seq, ack, payload=b'', ttl=64, ip_id=0, df=True):
+    """
+    Return an Ethernet frame with a TCP/IPv4 packet. Checksums are left 0.
+    """
+    ip_len = IP_HEADER.size + TCP_HEADER.size + len(payload)
+    return ETH_HEADER.pack(b'\x02\x00\x00\x00\x00\x02', b'\x02\x00\x00\x00\x00\x01', 0x0800) + \
+        IP_HEADER.pack(0x45, 0, ip_len, ip_id, IP_DF if df else 0, ttl, socket.IPPROTO_TCP, 0, src, dst) + \
+        TCP_HEADER.pack(sport, dport, seq, ack, (5 << 12) | flags, 65535, 0, 0) + payload
+
+class Delay:
+    """
+    A random PSH to RST delay in seconds.
+    """
+
+    def __init__(self, rng, dist, mean):
+        self.rng = rng
+        self.dist = dist
+        self.mean = mean
+
+    def __call__(self):
+        if self.dist == 'exp':
+            return self.rng.expovariate(1 / self.mean)
+        elif self.dist == 'lognormal':
+            # sigma = 1, with mu such that the mean is self.mean.
+            return self.rng.lognormvariate(0, 1) * self.mean / 1.6487212707001282
+        elif self.dist == 'uniform':
+            return self.rng.uniform(0, 2 * self.mean)
+        return self.mean
+
+def sessions(n, rng, delay, censored, wrong_ack, rsts, interval, firewall):
+    """
+    Yield (start, events, censored) for every session: its start time,
+    the (ts, frame) of its packets, and whether the firewall resets it.
+    """
+    server = socket.inet_aton(firewall)
+    for i in range(n):
+        start = i * interval
+        client = struct.pack('!I', 0x0A000000 | i & 0xffffff)
+        sport = 1024 + i % 64000
+        # Sequence numbers that do not wrap within the session, as
+        # extract.py does not expect them to.
+        cseq = rng.getrandbits(31)
+        sseq = rng.getrandbits(31)
+        hello = client_hello(f"site{i}.example")
+        psh_ts = start + 0.0003
+        events = [
+            (start, packet(client, server, sport, 443, TH_SYN, cseq, 0)),
+            (start + 0.0001, packet(server, client, 443, sport, TH_SYN | TH_ACK, sseq, cseq + 1)),
+            (start + 0.0002, packet(client, server, sport, 443, TH_ACK, cseq + 1, sseq + 1)),
+            (psh_ts, packet(client, server, sport, 443, TH_PUSH | TH_ACK, cseq + 1, sseq + 1, hello)),
+        ]
+        expected = cseq + 1 + len(hello)
+        if rng.random() < censored:
+            ts = psh_ts + delay()
+            if rng.random() < wrong_ack:
+                events.append((ts, packet(server, client, 443, sport, TH_RST, sseq + 1, expected + 1,
+                                          ttl=rng.randrange(40, 250), ip_id=rng.getrandbits(16), df=False)))
+                ts += 0.0001
+            events.append((ts, packet(server, client, 443, sport, TH_RST | TH_ACK, sseq + 1, expected,
+                                      ttl=rng.randrange(40, 250), ip_id=rng.getrandbits(16))))
+            for k in range(1, rsts):
+                events.append((ts + k * 0.0001, packet(server, client, 443, sport, TH_RST, sseq + 1,
+                                                       expected - k, ip_id=rng.getrandbits(16))))
+            yield start, events, True
+        else:
+            events.append((psh_ts + 0.002, packet(server, client, 443, sport, TH_ACK, sseq + 1, expected)))
+            events.append((psh_ts + 0.003, packet(server, client, 443, sport, TH_FIN | TH_ACK, sseq + 1, expected)))
+            yield start, events, False
+
+def ordered(session_events):
+    """
+    Merge the packets of overlapping sessions into timestamp order. Only
+    packets that may still be preceded by those of later sessions are
+    held back.
+    """
+    heap = []
+    seq = 0
+    for start, events, _ in session_events:
+        while heap and heap[0][0] <= start:
+            ts, _, frame = heapq.heappop(heap)
+            yield ts, frame
+        for ts, frame in events:
+            heapq.heappush(heap, (ts, seq, frame))
+            seq += 1
+    while heap:
+        ts, _, frame = heapq.heappop(heap)
+        yield ts, frame
+
+# The writers take timestamps in seconds relative to a start time in whole
+# seconds, so that nanoseconds are not lost to float precision.
+
+class PcapWriter:
+    def __init__(self, f, start, nano=False):
+        self.f = f
+        self.units = 10 ** 9 if nano else 10 ** 6
+        self.start = start * self.units
+        f.write(struct.pack('<IHHiIII', PCAP_MAGIC_NANO if nano else PCAP_MAGIC, 2, 4, 0, 0, 65535, 1))
+
+    def write(self, ts, frame):
+        t = self.start + round(ts * self.units)
+        self.f.write(struct.pack('<IIII', t // self.units, t % self.units, len(frame), len(frame)))
+        self.f.write(frame)
+
+class PcapngWriter:
+    def __init__(self, f, start, nano=False):
+        self.f = f
+        self.units = 10 ** 9 if nano else 10 ** 6
+        self.start = start * self.units
+        self._block(0x0A0D0D0A, struct.pack('<IHHq', 0x1A2B3C4D, 1, 0, -1))
+        options = struct.pack('<HHB3x', 9, 1, 9 if nano else 6) + struct.pack('<HH', 0, 0)
+        self._block(0x00000001, struct.pack('<HHI', 1, 0, 65535) + options)
+
+    def _block(self, block_type, body):
+        body += bytes(-len(body) % 4)
+        length = len(body) + 12
+        self.f.write(struct.pack('<II', block_type, length) + body + struct.pack('<I', length))
+
+    def write(self, ts, frame):
+        t = self.start + round(ts * self.units)
+        self._block(0x00000006, struct.pack('<IIIII', 0, t >> 32, t & 0xffffffff, len(frame), len(frame)) + frame)
+
+def generate(f, n=10000, censored=0.8, wrong_ack=0.2, rsts=1, delay='exp', mean=0.02, interval=0.001,
+             firewall='1.1.1.1', format='pcap', nano=False, seed=0, start=1700000000):
+    """
+    Write a synthetic capture to the binary file f. Return a dict with the
+    number of packets, sessions and censored sessions.
+    """
+    rng = random.Random(seed)
+    writer = (PcapngWriter if format == 'pcapng' else PcapWriter)(f, start, nano)
+    stats = {'packets': 0, 'sessions': n, 'censored': 0}
+
+    def counted(session_events):
+        for session in session_events:
+            stats['censored'] += session[2]
+            yield session
+
+    source = sessions(n, rng, Delay(rng, delay, mean), censored, wrong_ack, rsts, interval, firewall)
+    for ts, frame in ordered(counted(source)):
+        writer.write(ts, frame)
+        stats['packets'] += 1
+    return stats
+
+if __name__ == '__main__':
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "hn:c:w:r:d:m:i:f:F:s:",
+                                       ["help", "sessions=", "censored=", "wrong-ack=", "rsts=", "delay=", "mean=",
+                                        "interval=", "firewall=", "format=", "nano", "seed="])
+    except getopt.GetoptError as err:
+        eprint(err)
+        usage()
+        sys.exit(2)
+
+    kwargs = {}
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            usage()
+            sys.exit(0)
+        elif o in ("-n", "--sessions"):
+            kwargs['n'] = int(a)
+        elif o in ("-c", "--censored"):
+            kwargs['censored'] = float(a)
+        elif o in ("-w", "--wrong-ack"):
+            kwargs['wrong_ack'] = float(a)
+        elif o in ("-r", "--rsts"):
+            kwargs['rsts'] = int(a)
+        elif o in ("-d", "--delay"):
+            if a not in DELAYS:
+                eprint(f"Unknown delay distribution: {a}")
+                sys.exit(2)
+            kwargs['delay'] = a
+        elif o in ("-m", "--mean"):
+            kwargs['mean'] = float(a) / 1000
+        elif o in ("-i", "--interval"):
+            kwargs['interval'] = float(a) / 1000
+        elif o in ("-f", "--firewall"):
+            kwargs['firewall'] = a
+        elif o in ("-F", "--format"):
+            if a not in ('pcap', 'pcapng'):
+                eprint(f"Unknown format: {a}")
+                sys.exit(2)
+            kwargs['format'] = a
+        elif o == "--nano":
+            kwargs['nano'] = True
+        elif o in ("-s", "--seed"):
+            kwargs['seed'] = int(a)
+
+    if len(args) != 1:
+        usage()
+        sys.exit(2)
+
+    with open(args[0], 'wb') as f:
+        stats = generate(f, **kwargs)
+    eprint(f"{args[0]}: {stats['packets']} packets, {stats['sessions']} sessions, {stats['censored']} censored")
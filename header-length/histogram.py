@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+
+import sys
+import getopt
+import glob
+import json
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Header-length histograms of the JSONL output of tap/header_len_count.
+# Every record maps, for each filter, a TCP header length to a counter:
+#
+#   {"tcp_pkts_2": {"20": {"count": 1234}, "32": {"count": 56}}, "tcp_pkts_3": {...}, ...}
+#
+# Records are folded one at a time into a fixed-size array of counts per
+# filter, indexed by header length, so that the size of the input does not
+# matter.
+#
+# A histogram is saved as a snapshot: one JSON line with the counts of
+# every filter and where they came from,
+#
+#   {"format": "header-length-histogram", "version": 1, "max_header_len": 60,
+#    "records": 2, "sources": ["host-a.jsonl", "host-b.jsonl"],
+#    "counts": {"tcp_pkts_2": [0, ..., 1234, ...], "tcp_pkts_3": [...]}}
+#
+# Merging snapshots adds their counts, so snapshots of hosts or hours can
+# be merged in any order and grouping. A snapshot is also a valid record
+# of the input: snapshots and tap output may be concatenated and read
+# together.
+
+# The filters of the tap and the names they are plotted under.
+PROTOCOLS = {
+    "tcp_pkts_2": "TCP",
+    "tcp_pkts_3": "TLS",
+}
+
+# The TCP data offset is 4 bits, counting 32-bit words.
+MAX_HEADER_LEN = 15 * 4
+
+SNAPSHOT_FORMAT = "header-length-histogram"
+SNAPSHOT_VERSION = 1
+
+loads = orjson.loads if orjson is not None else json.loads
+
+def usage(f=sys.stderr):
+    program = sys.argv[0]
+    f.write(f"""\
+Usage: {program} [OPTIONS] [FILE...]
+This script folds the JSONL output of tap/header_len_count, and merges histogram snapshots, into one
+snapshot of per-filter header-length counts, which plot.py reads like the tap output. Inputs may mix
+tap output and snapshots. With no FILE, or when FILE is -, read standard input.
+
+  -h, --help            show this help
+  -o, --out=FILE        write to FILE (default: stdout)
+  -s, --source=NAME     record the tap output as coming from NAME, e.g. a host name (default: the
+                        input filenames); sources of merged snapshots are kept
+
+Example:
+  {program} --source host-a --out host-a.hist.json header_len.jsonl
+  {program} --out header_len.hist.json host-*.hist.json
+""")
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+class Histogram:
+    """
+    Counts of packets by TCP header length for every filter of the tap,
+    with the number of tap records and the sources they came from. Only
+    the filters that some record had are in counts.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.records = 0
+        self.sources = []
+
+    def _hist(self, key):
+        hist = self.counts.get(key)
+        if hist is None:
+            hist = self.counts[key] = np.zeros(MAX_HEADER_LEN + 1, dtype=np.int64)
+        return hist
+
+    def fold(self, record):
+        """
+        Add the counts of one decoded record, either tap output or a
+        snapshot.
+        """
+        if record.get("format") == SNAPSHOT_FORMAT:
+            self.merge(Histogram.from_snapshot(record))
+            return
+        self.records += 1
+        for key in PROTOCOLS:
+            entry = record.get(key)
+            if not isinstance(entry, dict):
+                continue
+            hist = self._hist(key)
+            for length, value in entry.items():
+                if 'count' in value:
+                    length = int(length)
+                    if not 0 <= length <= MAX_HEADER_LEN:
+                        raise ValueError(f"{key}: header length {length} out of range")
+                    hist[length] += value['count']
+
+    def merge(self, other):
+        """
+        Add the counts, records and sources of other.
+        """
+        for key, hist in other.counts.items():
+            self._hist(key)[:] += hist
+        self.records += other.records
+        self.sources.extend(other.sources)
+
+    def cdf(self, key):
+        """
+        Return the header lengths that occur in the counts of key,
+        ascending, and the fraction of packets with a header of at most
+        each length.
+        """
+        hist = self.counts[key]
+        lengths = np.flatnonzero(hist)
+        cumulative_counts = np.cumsum(hist[lengths])
+        return lengths, cumulative_counts / cumulative_counts[-1]
+
+    def snapshot(self):
+        """
+        Return the histogram as a snapshot record.
+        """
+        return {
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "max_header_len": MAX_HEADER_LEN,
+            "records": self.records,
+            "sources": self.sources,
+            "counts": {key: hist.tolist() for key, hist in self.counts.items()},
+        }
+
+    @classmethod
+    def from_snapshot(cls, record):
+        """
+        Return the histogram of a snapshot record. Raise ValueError if it
+        is of another version or bucket count.
+        """
+        if record.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported snapshot version {record.get('version')}")
+        if record.get("max_header_len") != MAX_HEADER_LEN:
+            raise ValueError(f"snapshot has max_header_len {record.get('max_header_len')}, expected {MAX_HEADER_LEN}")
+        hist = cls()
+        for key, counts in record["counts"].items():
+            if len(counts) != MAX_HEADER_LEN + 1:
+                raise ValueError(f"{key}: snapshot has {len(counts)} buckets, expected {MAX_HEADER_LEN + 1}")
+            hist.counts[key] = np.array(counts, dtype=np.int64)
+        hist.records = record["records"]
+        hist.sources = list(record["sources"])
+        return hist
+
+def read(files, source=None):
+    """
+    Fold every JSONL record of files, opened in binary mode, into a new
+    histogram and return it. Tap output is recorded as coming from source,
+    or else from the name of its file; snapshots carry their own sources.
+    """
+    hist = Histogram()
+    tapped = False
+    for f in files:
+        tap_output = False
+        for line in f:
+            if line.strip():
+                record = loads(line)
+                tap_output |= record.get("format") != SNAPSHOT_FORMAT
+                hist.fold(record)
+        if tap_output and source is None:
+            hist.sources.append('-' if f is sys.stdin.buffer else f.name)
+        tapped |= tap_output
+    if tapped and source is not None:
+        hist.sources.append(source)
+    return hist
+
+def input_files(args):
+    if not args:
+        yield sys.stdin.buffer
+    else:
+        for arg in args:
+            if arg == "-":
+                yield sys.stdin.buffer
+            else:
+                for path in glob.glob(arg):
+                    with open(path, 'rb') as f:
+                        yield f
+
+if __name__ == '__main__':
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "ho:s:", ["help", "out=", "source="])
+    except getopt.GetoptError as err:
+        eprint(err)
+        usage()
+        sys.exit(2)
+
+    output_filename = None
+    source = None
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            usage()
+            sys.exit(0)
+        elif o in ("-o", "--out"):
+            output_filename = a
+        elif o in ("-s", "--source"):
+            source = a
+
+    hist = read(input_files(args), source)
+    output_file = open(output_filename, 'w') if output_filename else sys.stdout
+    output_file.write(json.dumps(hist.snapshot(), separators=(',', ':')) + "\n")
+    if output_file is not sys.stdout:
+        output_file.close()
+    eprint(f"{hist.records} records from {len(hist.sources)} sources")
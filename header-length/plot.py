@@ -7,10 +7,9 @@ import glob
 import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
-import json
 
 import common
+import histogram
 
 FIGSIZE = (common.COLUMNWIDTH, 2.0)
 
@@ -18,7 +17,8 @@ def usage(f=sys.stderr):
     program = sys.argv[0]
     f.write(f"""
 Usage: {program} [FILENAME...]
-This script reads from JSONL files and plots a CDF. With no FILE, or when FILE is -, read standard input. By default, print results to stdout and log to stderr.
+This script reads from JSONL files and plots a CDF. The files may be the output of tap/header_len_count
+or histogram snapshots written by histogram.py, or both. With no FILE, or when FILE is -, read standard input. By default, print results to stdout and log to stderr.
 
   -h, --help            show this help
   -o, --out             write to file (default: figure.pdf)
@@ -45,25 +45,6 @@ def input_files(args, binary=False):
                     with open(path, MODE) as f:
                         yield f
 
-def aggregate_header_length_counts(tcp_pkts_column):
-    lengths, counts = [], []
-    for entry in tcp_pkts_column.dropna():
-        if isinstance(entry, dict):
-            for length, value in entry.items():
-                if 'count' in value:
-                    lengths.append(int(length))  # Convert header length to integer
-                    counts.append(value['count'])
-    return lengths, counts
-
-def calculate_cdf_by_length(lengths, counts):
-    # Sort by header length and calculate cumulative distribution
-    sorted_indices = np.argsort(lengths)
-    sorted_lengths = np.array(lengths)[sorted_indices]
-    sorted_counts = np.array(counts)[sorted_indices]
-    cumulative_counts = np.cumsum(sorted_counts)
-    cdf = cumulative_counts / cumulative_counts[-1]
-    return sorted_lengths, cdf
-
 if __name__ == '__main__':
     try:
         opts, args = getopt.gnu_getopt(sys.argv[1:], "ho:n", ["help", "out=", "no-show"])
@@ -83,32 +64,25 @@ if __name__ == '__main__':
         if o == "-n" or o == "--no-show":
             show_plot = False
 
-    # Read data from input files
-    data = []
-    for f in input_files(args):
-        for line in f:
-            data.append(json.loads(line))
-
-    # Convert to DataFrame
-    df = pd.DataFrame(data)
+    # Fold the records of the input files into one histogram per filter
+    hist = histogram.read(input_files(args, binary=True))
 
-    # Ensure the relevant columns exist
-    if 'tcp_pkts_2' in df.columns and 'tcp_pkts_3' in df.columns:
-        # Aggregate header lengths and counts for tcp_pkts_2 and tcp_pkts_3
-        lengths_2, counts_2 = aggregate_header_length_counts(df['tcp_pkts_2'])
-        lengths_3, counts_3 = aggregate_header_length_counts(df['tcp_pkts_3'])
+    # Ensure the relevant filters were present
+    if 'tcp_pkts_2' in hist.counts and 'tcp_pkts_3' in hist.counts:
+        hist_2 = hist.counts['tcp_pkts_2']
+        hist_3 = hist.counts['tcp_pkts_3']
 
         # Calculate the total number of packets for TCP and TLS
-        total_tcp_packets = sum(counts_2)
-        total_tls_packets = sum(counts_3)
+        total_tcp_packets = int(hist_2.sum())
+        total_tls_packets = int(hist_3.sum())
 
         # Report the total counts using eprint()
         eprint(f"Total TCP packets: {total_tcp_packets}")
         eprint(f"Total TLS packets: {total_tls_packets}")
 
         # Calculate the number of packets with header length 20 for both TCP and TLS
-        tcp_packets_with_length_20 = sum(count for length, count in zip(lengths_2, counts_2) if length == 20)
-        tls_packets_with_length_20 = sum(count for length, count in zip(lengths_3, counts_3) if length == 20)
+        tcp_packets_with_length_20 = int(hist_2[20])
+        tls_packets_with_length_20 = int(hist_3[20])
 
         # Calculate the percentage of packets with header length 20
         tcp_percentage_length_20 = (tcp_packets_with_length_20 / total_tcp_packets) * 100 if total_tcp_packets > 0 else 0
@@ -121,8 +95,8 @@ if __name__ == '__main__':
 
 
         # Calculate CDF for both sets of lengths and counts
-        sorted_lengths_2, cdf_2 = calculate_cdf_by_length(lengths_2, counts_2)
-        sorted_lengths_3, cdf_3 = calculate_cdf_by_length(lengths_3, counts_3)
+        sorted_lengths_2, cdf_2 = hist.cdf('tcp_pkts_2')
+        sorted_lengths_3, cdf_3 = hist.cdf('tcp_pkts_3')
 
         # Plotting
         fig = plt.figure(figsize=FIGSIZE)
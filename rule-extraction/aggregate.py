@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import getopt
+import glob
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+import ingest
+import presence
+
+# Rows of the raw scan shards whose result is a TLS connection torn down
+# by the censor. Matched anywhere in the row, as `grep TLS,EOF` did.
+CENSORED = b"TLS,EOF"
+
+def usage(f=sys.stderr):
+    program = sys.argv[0]
+    f.write(f"""\
+Usage: {program} [OPTIONS] SHARD...
+This script reads raw 1m_sni_block_rules_*.csv scan shards, keeps the SNI (second column) of
+the rows with a TLS,EOF result, and writes the sorted, deduplicated SNIs, one per line. It
+replaces concatenating the shards into an aggregated CSV and running
+
+  grep TLS,EOF aggregated.csv | cut -d, -f2 | sort -u
+
+Shards are read in parallel and streamed; only matching rows are kept.
+
+  -h, --help            show this help
+  -o, --out=FILE        write to FILE (default: stdout)
+  -j, --jobs=N          read N shards in parallel (default: one per CPU)
+  --store=PREFIX        also append the output to the presence store at PREFIX (see
+                        ../data/presence.py); requires --out named *_YYYY-MM-DD.txt
+
+Example:
+  {program} --out data/censored-block-rules-guangzhou_2024-01-01.txt 'data/1m_sni_block_rules_2024-01-01_*_guangzhou.csv'
+""")
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+def censored_snis(path):
+    """
+    Return the set of SNIs of the censored rows of one shard.
+    """
+    snis = set()
+    with open(path, 'rb') as f:
+        for line in f:
+            if CENSORED in line:
+                fields = line.rstrip(b"\n").split(b",", 2)
+                snis.add(fields[1] if len(fields) > 1 else fields[0])
+    return snis
+
+def aggregate(paths, nprocs=None):
+    """
+    Return the sorted SNIs of the censored rows of all shards, as bytes,
+    in the order of `sort -u` in the C locale.
+    """
+    nprocs = nprocs or ingest.processes()
+    snis = set()
+    if nprocs <= 1 or len(paths) <= 1:
+        for path in paths:
+            snis |= censored_snis(path)
+    else:
+        with Pool(min(nprocs, len(paths))) as pool:
+            for shard in pool.imap_unordered(censored_snis, paths):
+                snis |= shard
+    return sorted(snis)
+
+if __name__ == '__main__':
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "ho:j:", ["help", "out=", "jobs=", "store="])
+    except getopt.GetoptError as err:
+        eprint(err)
+        usage()
+        sys.exit(2)
+
+    output_filename = None
+    nprocs = None
+    store_prefix = None
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            usage()
+            sys.exit(0)
+        elif o in ("-o", "--out"):
+            output_filename = a
+        elif o in ("-j", "--jobs"):
+            nprocs = int(a)
+        elif o == "--store":
+            store_prefix = a
+
+    if store_prefix and (not output_filename or presence.snapshot_date(output_filename) is None):
+        eprint("Error: --store requires --out FILE named *_YYYY-MM-DD.txt")
+        sys.exit(2)
+
+    paths = sorted(set(path for arg in args for path in glob.glob(arg)))
+    if not paths:
+        eprint("No matching shards found.")
+
+    snis = aggregate(paths, nprocs)
+    output_file = open(output_filename, 'wb') if output_filename else sys.stdout.buffer
+    for sni in snis:
+        output_file.write(sni + b"\n")
+    if output_file is not sys.stdout.buffer:
+        output_file.close()
+
+    if store_prefix:
+        day = presence.snapshot_date(output_filename)
+        added = presence.append(store_prefix, [(day, output_filename)], nprocs)
+        eprint(f"{store_prefix}: ingested {len(added)} new days")
@@ -5,6 +5,10 @@ import getopt
 import glob
 import csv
 
+import numpy as np
+
+import rulestore
+
 def usage(f=sys.stderr):
     program = sys.argv[0]
     f.write(f"""\
@@ -16,9 +20,15 @@ Options:
   -h, --help            Show this help message.
   -o, --out             Write output to file (default: stdout).
   -b, --binary          Read input as binary (default: False).
+  -s, --store=PREFIX    Count from the rule store at PREFIX (see rulestore.py), rebuilding it from
+                        the given result files first if they changed. The files must be named
+                        *_YYYY-MM-DD_result.txt.
+  --marginals           With --store, output how often each rule matched instead.
+  --changes             With --store, output per-date changes in rule sets instead.
 
 Example:
   {program} results/censored-block-rules-california_*_result.txt > output.csv
+  {program} --store gfw-rules results/censored-block-rules-california_*_result.txt > output.csv
 """)
 
 def eprint(*args, **kwargs):
@@ -58,9 +68,46 @@ def process_lines(files, binary=False):
             total += 1
     return counts, total
 
+def store_counts(store):
+    """Counts each rule combination in a rule store, in first-appearance order."""
+    counts, first = store.combinations()
+    values = np.flatnonzero(counts)
+    values = values[np.argsort(first[values])]
+    labels = rulestore.classify.rule_labels()
+    return {labels[m]: int(counts[m]) for m in values}, int(counts.sum())
+
+def write_counts(writer, counts, total):
+    """Writes token counts and percentages, most frequent first."""
+    # Sort tokens by count in descending order.
+    sorted_tokens = sorted(counts.items(), key=lambda item: item[1], reverse=True)
+
+    # Write CSV header.
+    writer.writerow(["token", "count", "percentage"])
+
+    for token, count in sorted_tokens:
+        percentage = (count / total * 100) if total > 0 else 0
+        # Format the percentage to two decimal places.
+        writer.writerow([token, count, f"{percentage:.2f}"])
+
+def write_marginals(writer, store):
+    """Writes how many (domain, date) entries of a rule store match each rule."""
+    marginals = store.marginals()
+    total = int(np.count_nonzero(store.masks))
+    writer.writerow(["rule", "count", "percentage"])
+    for k, label in enumerate(rulestore.classify.LABELS):
+        percentage = (marginals[k] / total * 100) if total > 0 else 0
+        writer.writerow([label, marginals[k], f"{percentage:.2f}"])
+
+def write_changes(writer, store):
+    """Writes, per date, how many domains entered, left or changed rule set."""
+    added, removed, changed = store.changes()
+    writer.writerow(["date", "added", "removed", "changed"])
+    for row in zip(store.dates[1:], added, removed, changed):
+        writer.writerow(row)
+
 def main():
     try:
-        opts, args = getopt.gnu_getopt(sys.argv[1:], "ho:b", ["help", "out=", "binary"])
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "ho:bs:", ["help", "out=", "binary", "store=", "marginals", "changes"])
     except getopt.GetoptError as err:
         eprint(err)
         usage()
@@ -68,6 +115,8 @@ def main():
 
     output_file = sys.stdout
     binary_input = False
+    store_prefix = None
+    report = "combinations"
     for o, a in opts:
         if o in ("-h", "--help"):
             usage()
@@ -76,24 +125,29 @@ def main():
             output_file = open(a, 'a+')
         elif o in ("-b", "--binary"):
             binary_input = True
-
-    # Read through input files and process lines to count tokens from the second field.
-    files_gen = input_files(args, binary=binary_input)
-    counts, total = process_lines(files_gen, binary=binary_input)
-
-    # Sort tokens by count in descending order.
-    sorted_tokens = sorted(counts.items(), key=lambda item: item[1], reverse=True)
+        elif o in ("-s", "--store"):
+            store_prefix = a
+        elif o == "--marginals":
+            report = "marginals"
+        elif o == "--changes":
+            report = "changes"
 
     # Create a CSV writer to output the results.
     # use TSV
     writer = csv.writer(output_file, delimiter='\t')
-    # Write CSV header.
-    writer.writerow(["token", "count", "percentage"])
 
-    for token, count in sorted_tokens:
-        percentage = (count / total * 100) if total > 0 else 0
-        # Format the percentage to two decimal places.
-        writer.writerow([token, count, f"{percentage:.2f}"])
+    if store_prefix is not None:
+        store = rulestore.RuleStore.open(store_prefix, rulestore.result_files(args) if args else None)
+        if report == "marginals":
+            write_marginals(writer, store)
+        elif report == "changes":
+            write_changes(writer, store)
+        else:
+            write_counts(writer, *store_counts(store))
+    else:
+        # Read through input files and process lines to count tokens from the second field.
+        files_gen = input_files(args, binary=binary_input)
+        write_counts(writer, *process_lines(files_gen, binary=binary_input))
 
     if output_file is not sys.stdout:
         output_file.close()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import getopt
+import glob
+from multiprocessing import Pool
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+import ingest
+
+# Number of test variants per base domain, in the order of
+# generate_domain() in ../util/generate-test-domains.py.
+NRULES = 9
+
+# Rule label of each variant in the "domain rules" result format, as
+# rule-parser.sh numbers them: the base domain is 1, the following
+# variants 2 to 8, and the last one 0.
+LABELS = ["1", "2", "3", "4", "5", "6", "7", "8", "0"]
+
+def usage(f=sys.stderr):
+    program = sys.argv[0]
+    f.write(f"""\
+Usage: {program} [OPTIONS] --domains PATTERN CHECKER...
+This script finds which test variants of every censored base domain (see
+../util/generate-test-domains.py) appear in each checker file, i.e. in the list of test domains
+found blocked on one date, and writes one "domain rules" result file per checker file, in the
+format of rule-parser.sh. It replaces running
+
+  cat PATTERN | sort -u | generate-test-domains.py | rule-parser.sh CHECKER
+
+once per checker file: the base domains are read once, and no variant strings are generated.
+
+  -h, --help            show this help
+  -d, --domains=PATTERN the files of base domains (may be given more than once)
+  -o, --out=DIR         write result files to DIR (default: results)
+  -r, --random          the random string of the test variants (default: ZZZZ)
+  -j, --jobs=N          classify N checker files in parallel (default: one per CPU)
+
+Each CHECKER file DIR/NAME.txt is written to DIR/NAME_result.txt.
+
+Example:
+  {program} --domains '../data/censored-sni-guangzhou_*' ./data/censored-block-rules-guangzhou_*
+""")
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+def affixes(random_str):
+    """
+    Return the (prefix, suffix) that each variant adds to the base domain,
+    matching generate_domain().
+    """
+    prefixes = ["", random_str + ".", random_str]
+    suffixes = ["", "." + random_str, random_str]
+    return [("", "")] + [("", s) for s in suffixes[1:]] + [(p, "") for p in prefixes[1:]] + \
+        [(p, s) for p in prefixes[1:] for s in suffixes[1:]]
+
+def rule_masks(checker, index, random_str):
+    """
+    Return a uint16 array with, for every base domain ID in index, bit k
+    set if variant k of the domain is in checker.
+
+    Rather than generating the variants of every base domain, every
+    checker entry is split into each (prefix, base, suffix) it could be
+    and the base looked up, so the work is proportional to the checker.
+    """
+    masks = np.zeros(len(index), dtype=np.uint16)
+    rules = affixes(random_str)
+    for entry in checker:
+        for k, (prefix, suffix) in enumerate(rules):
+            if len(entry) > len(prefix) + len(suffix) and entry.startswith(prefix) and entry.endswith(suffix):
+                i = index.get(entry[len(prefix):len(entry) - len(suffix)])
+                if i is not None:
+                    masks[i] |= 1 << k
+    return masks
+
+def rule_labels():
+    """
+    Return the rule labels of every mask value, e.g. 0b1001 => "1,4".
+    """
+    return [",".join(LABELS[k] for k in range(NRULES) if m >> k & 1) for m in range(1 << NRULES)]
+
+def read_checker(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return set(line.rstrip("\n") for line in f)
+
+def result_path(out_dir, checker_path):
+    name, ext = os.path.splitext(os.path.basename(checker_path))
+    return os.path.join(out_dir, f"{name}_result{ext}")
+
+_domains = None
+_index = None
+_random_str = None
+
+def _init(domains, random_str):
+    global _domains, _index, _random_str
+    _domains = domains
+    _index = {d: i for i, d in enumerate(domains)}
+    _random_str = random_str
+
+def classify(job):
+    checker_path, out_path = job
+    masks = rule_masks(read_checker(checker_path), _index, _random_str)
+    labels = rule_labels()
+    # rule-parser.sh drops domains whose only match is the last variant:
+    # its label is the number 0, which awk treats as false.
+    skip = 1 << (NRULES - 1)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        for i in np.flatnonzero((masks != 0) & (masks != skip)):
+            f.write(f"{_domains[i]} {labels[masks[i]]}\n")
+    return out_path
+
+if __name__ == '__main__':
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "hd:o:r:j:", ["help", "domains=", "out=", "random=", "jobs="])
+    except getopt.GetoptError as err:
+        eprint(err)
+        usage()
+        sys.exit(2)
+
+    patterns = []
+    out_dir = "results"
+    random_str = "ZZZZ"
+    nprocs = None
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            usage()
+            sys.exit(0)
+        elif o in ("-d", "--domains"):
+            patterns.append(a)
+        elif o in ("-o", "--out"):
+            out_dir = a
+        elif o in ("-r", "--random"):
+            random_str = a
+        elif o in ("-j", "--jobs"):
+            nprocs = int(a)
+
+    checkers = [path for arg in args for path in sorted(glob.glob(arg))]
+    if not patterns or not checkers:
+        usage()
+        sys.exit(2)
+
+    paths = sorted(set(path for pattern in patterns for path in glob.glob(pattern)))
+    index, _ = ingest.ingest(paths, nprocs=nprocs)
+    # Same order as `sort -u` in the C locale.
+    domains = sorted(index, key=lambda d: d.encode("utf-8"))
+
+    jobs = [(path, result_path(out_dir, path)) for path in checkers]
+    nprocs = nprocs or ingest.processes()
+    if nprocs <= 1:
+        _init(domains, random_str)
+        for out_path in map(classify, jobs):
+            eprint(out_path)
+    else:
+        with Pool(min(nprocs, len(jobs)), initializer=_init, initargs=(domains, random_str)) as pool:
+            for out_path in pool.imap(classify, jobs):
+                eprint(out_path)
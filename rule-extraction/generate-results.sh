@@ -1,16 +1,11 @@
 #!/bin/bash
 
-cd "$(dirname "$0")" || exit 1xsa
+cd "$(dirname "$0")" || exit 1
 
-for file in ./data/censored-block-rules-guangzhou_*; do
-    filename=$(basename "$file")
-    output_file="./results/${filename%.*}_result.${filename##*.}"
-	cat ../data/censored-sni-guangzhou_* | sort -u | python3 ../util/generate-test-domains.py | ./rule-parser.sh "$file" > $output_file
-done
+# Same results as running, for every checker file,
+#   cat ../data/censored-sni-guangzhou_* | sort -u | python3 ../util/generate-test-domains.py | ./rule-parser.sh "$file"
+# with the base domains read once and the checker files classified in parallel.
 
+python3 ./classify.py --out ./results --domains '../data/censored-sni-guangzhou_*' './data/censored-block-rules-guangzhou_*'
 
-for file in ./data/censored-block-rules-california_*; do
-    filename=$(basename "$file")
-    output_file="./results/${filename%.*}_result.${filename##*.}"
-	cat ../data/censored-sni-california_* | sort -u | python3 ../util/generate-test-domains.py | ./rule-parser.sh "$file" > $output_file
-done
\ No newline at end of file
+python3 ./classify.py --out ./results --domains '../data/censored-sni-california_*' './data/censored-block-rules-california_*'
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import getopt
+import glob
+from array import array
+from bisect import bisect_left
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+import ingest
+
+import classify
+
+# Where a base domain occurs in an SNI is described by the character on
+# each side of it: none (the start or end of the SNI), a dot, or any other
+# character. The nine (left, right) contexts are the nine test variants of
+# generate_domain() in ../util/generate-test-domains.py, so contexts are
+# numbered by the bit of their variant in a rule mask (see classify.py):
+# e.g. "ZZZZ.youtube.com" is youtube.com in context (dot, none), variant 3,
+# rule label "4".
+NONE, DOT, OTHER = 0, 1, 2
+CONTEXT_BIT = [
+    0, 1, 2,    # (none, none), (none, dot), (none, other)
+    3, 5, 6,    # (dot, none), (dot, dot), (dot, other)
+    4, 7, 8,    # (other, none), (other, dot), (other, other)
+]
+
+def context_mask(*contexts):
+    mask = 0
+    for left, right in contexts:
+        mask |= 1 << CONTEXT_BIT[3 * left + right]
+    return mask
+
+# The match rules a censor may apply to a base domain D, from the tightest,
+# with the contexts each one matches. The set is closed under intersection,
+# so the tightest rule that matches a given set of contexts is unique.
+RULES = [
+    ("exact", context_mask((NONE, NONE))),                                          # D
+    ("label-prefix", context_mask((NONE, NONE), (NONE, DOT))),                      # D, D.*
+    ("label-suffix", context_mask((NONE, NONE), (DOT, NONE))),                      # D, *.D
+    ("prefix", context_mask((NONE, NONE), (NONE, DOT), (NONE, OTHER))),             # D*
+    ("suffix", context_mask((NONE, NONE), (DOT, NONE), (OTHER, NONE))),             # *D
+    ("label-boundary", context_mask(*((l, r) for l in (NONE, DOT) for r in (NONE, DOT)))),  # D, *.D, D.*, *.D.*
+    ("substring", (1 << classify.NRULES) - 1),                                      # *D*
+]
+
+def usage(f=sys.stderr):
+    program = sys.argv[0]
+    f.write(f"""\
+Usage: {program} [OPTIONS] --domains PATTERN --censored PATTERN
+This script infers the match rule that the censor applies to every base domain (exact, label-prefix,
+label-suffix, prefix, suffix, label-boundary or substring) from observed SNIs: the censored ones and,
+optionally, all the tested ones. Unlike rule-parser.sh, it needs no generated test variants: every
+observed SNI is matched against all base domains at once with an Aho-Corasick automaton, and each
+occurrence is classified by the characters around it.
+
+A censored SNI is evidence for the longest base domains it contains; an uncensored SNI (tested but
+not censored) is evidence against every base domain it contains. The output has one line per base
+domain with censored occurrences, in C-locale order:
+
+  DOMAIN RULE CENSORED UNCENSORED
+
+where CENSORED and UNCENSORED are the rule labels (see rule-parser.sh) of the contexts observed
+censored and uncensored, or "-". RULE is "inconsistent" if the tightest rule that matches the
+censored contexts also matches an uncensored one.
+
+  -h, --help            show this help
+  -d, --domains=PATTERN the files of base domains (may be given more than once)
+  -c, --censored=PATTERN the files of censored SNIs (may be given more than once)
+  -t, --tested=PATTERN  the files of all tested SNIs (may be given more than once)
+  -o, --out=FILE        write to FILE (default: stdout)
+  -j, --jobs=N          read N domain files in parallel (default: one per CPU)
+
+Example:
+  {program} --domains '../data/censored-sni-california_*' --censored ./data/censored-block-rules-2023-12-02.txt
+""")
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+class Automaton:
+    """
+    An Aho-Corasick automaton over a list of patterns, finding every
+    occurrence of every pattern in a byte string in one pass over it.
+
+    States are kept in flat NumPy arrays rather than one dict per state:
+    the transitions out of state s are labels[offsets[s]:offsets[s + 1]],
+    sorted, leading to the states at the same indexes of targets. A state
+    then takes about 21 bytes instead of a few hundred, and the automaton
+    of a 1M-domain list fits in a few hundred MB.
+    """
+
+    def __init__(self, patterns):
+        encoded = [p.encode("utf-8") for p in patterns]
+        self.lengths = np.fromiter((len(p) for p in encoded), dtype=np.int32, count=len(encoded))
+
+        # Insert the patterns in sorted order, so that each one only adds
+        # the states past its common prefix with the previous one, and the
+        # children of every state are created in the order of their labels.
+        parent = array("i", [0])
+        label = array("B", [0])
+        depth = array("H", [0])
+        end_states = array("i")
+        path = [0]
+        previous = b""
+        order = sorted(range(len(encoded)), key=encoded.__getitem__)
+        for i in order:
+            pattern = encoded[i]
+            common = 0
+            limit = min(len(pattern), len(previous))
+            while common < limit and pattern[common] == previous[common]:
+                common += 1
+            del path[common + 1:]
+            for d in range(common, len(pattern)):
+                path.append(len(parent))
+                parent.append(path[d])
+                label.append(pattern[d])
+                depth.append(d + 1)
+            end_states.append(path[len(pattern)])
+            previous = pattern
+        parent = np.frombuffer(parent, dtype=np.int32)
+        label = np.frombuffer(label, dtype=np.uint8)
+        depth = np.frombuffer(depth, dtype=np.uint16)
+        nstates = len(parent)
+        self.nstates = nstates
+
+        # The pattern that ends at every state, or -1.
+        self.output = np.full(nstates, -1, dtype=np.int32)
+        self.output[np.frombuffer(end_states, dtype=np.int32)] = order
+        del encoded, order
+
+        # Transitions, grouped by source state and sorted by label.
+        keys = parent[1:].astype(np.int64) << 8 | label[1:]
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        self.labels = label[1:][order]
+        self.targets = (order + 1).astype(np.int32)
+        self.offsets = np.searchsorted(keys >> 8, np.arange(nstates + 1)).astype(np.int32)
+
+        # Failure links and, per state, the next state on the failure chain
+        # where a pattern ends (or 0), a level of the trie at a time: the
+        # failure link of a state is shallower than the state itself.
+        self.fail = np.zeros(nstates, dtype=np.int32)
+        self.dict_link = np.zeros(nstates, dtype=np.int32)
+        by_depth = np.argsort(depth, kind="stable").astype(np.int32)
+        bounds = np.searchsorted(depth[by_depth], np.arange(depth.max() + 2))
+        for d in range(2, len(bounds) - 1):
+            states = by_depth[bounds[d]:bounds[d + 1]]
+            fail = np.empty(len(states), dtype=np.int32)
+            todo = np.arange(len(states))
+            current = self.fail[parent[states]]
+            wanted = label[states].astype(np.int64)
+            while len(todo):
+                # Follow the transition on the label of each state from the
+                # failure link of its parent, or else the failure link of
+                # that, up to the root.
+                key = current.astype(np.int64) << 8 | wanted
+                k = np.minimum(np.searchsorted(keys, key), len(keys) - 1)
+                found = keys[k] == key
+                fail[todo[found]] = self.targets[k[found]]
+                at_root = ~found & (current == 0)
+                fail[todo[at_root]] = 0
+                more = ~found & ~at_root
+                todo, current, wanted = todo[more], self.fail[current[more]], wanted[more]
+            self.fail[states] = fail
+            self.dict_link[states] = np.where(self.output[fail] >= 0, fail, self.dict_link[fail])
+
+        # The transitions out of the root, by far the busiest state, as a
+        # table of all 256 bytes.
+        self.root = [0] * 256
+        for k in range(self.offsets[0], self.offsets[1]):
+            self.root[self.labels[k]] = int(self.targets[k])
+
+    def matches(self, s):
+        """
+        Yield the (start, pattern) of every occurrence of a pattern in the
+        bytes s.
+        """
+        labels, targets, offsets = memoryview(self.labels), memoryview(self.targets), memoryview(self.offsets)
+        fail, output, dict_link = memoryview(self.fail), memoryview(self.output), memoryview(self.dict_link)
+        lengths = memoryview(self.lengths)
+        state = 0
+        root = self.root
+        for end, ch in enumerate(s, 1):
+            while state:
+                hi = offsets[state + 1]
+                k = bisect_left(labels, ch, offsets[state], hi)
+                if k < hi and labels[k] == ch:
+                    state = targets[k]
+                    break
+                state = fail[state]
+            else:
+                state = root[ch]
+            hit = state if output[state] >= 0 else dict_link[state]
+            while hit:
+                i = output[hit]
+                yield end - lengths[i], i
+                hit = dict_link[hit]
+
+def side(s, i):
+    if i < 0 or i >= len(s):
+        return NONE
+    return DOT if s[i] == ord(".") else OTHER
+
+def observe(automaton, snis, censored, masks):
+    """
+    Set, in masks, the context bit of the occurrences of the patterns in
+    every SNI. A censored SNI only marks its longest patterns.
+    """
+    lengths = automaton.lengths
+    for sni in snis:
+        sni = sni.encode("utf-8")
+        found = list(automaton.matches(sni))
+        if censored and found:
+            longest = max(lengths[i] for _, i in found)
+            found = [(start, i) for start, i in found if lengths[i] == longest]
+        for start, i in found:
+            masks[i] |= 1 << CONTEXT_BIT[3 * side(sni, start - 1) + side(sni, start + lengths[i])]
+
+def infer(censored, uncensored):
+    """
+    Return the name of the tightest rule matching all censored contexts,
+    "inconsistent" if it also matches an uncensored context, or None if
+    there are no censored contexts.
+    """
+    if not censored:
+        return None
+    for name, mask in RULES:
+        if censored & ~mask == 0:
+            return name if uncensored & mask == 0 else "inconsistent"
+
+def read_snis(patterns):
+    """
+    Return the set of SNIs in the files matching patterns.
+    """
+    snis = set()
+    for pattern in patterns:
+        for path in glob.glob(pattern):
+            snis.update(ingest.read_domains(path))
+    return snis
+
+if __name__ == '__main__':
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "hd:c:t:o:j:", ["help", "domains=", "censored=", "tested=", "out=", "jobs="])
+    except getopt.GetoptError as err:
+        eprint(err)
+        usage()
+        sys.exit(2)
+
+    domain_patterns = []
+    censored_patterns = []
+    tested_patterns = []
+    output_filename = None
+    nprocs = None
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            usage()
+            sys.exit(0)
+        elif o in ("-d", "--domains"):
+            domain_patterns.append(a)
+        elif o in ("-c", "--censored"):
+            censored_patterns.append(a)
+        elif o in ("-t", "--tested"):
+            tested_patterns.append(a)
+        elif o in ("-o", "--out"):
+            output_filename = a
+        elif o in ("-j", "--jobs"):
+            nprocs = int(a)
+
+    if not domain_patterns or not censored_patterns:
+        usage()
+        sys.exit(2)
+
+    paths = sorted(set(path for pattern in domain_patterns for path in glob.glob(pattern)))
+    index, _ = ingest.ingest(paths, nprocs=nprocs)
+    # Same order as `sort -u` in the C locale.
+    domains = sorted(index, key=lambda d: d.encode("utf-8"))
+    automaton = Automaton(domains)
+    eprint(f"{len(domains)} base domains, {automaton.nstates} states")
+
+    censored = read_snis(censored_patterns)
+    uncensored = read_snis(tested_patterns) - censored
+    censored_masks = np.zeros(len(domains), dtype=np.uint16)
+    uncensored_masks = np.zeros(len(domains), dtype=np.uint16)
+    observe(automaton, censored, True, censored_masks)
+    observe(automaton, uncensored, False, uncensored_masks)
+    eprint(f"{len(censored)} censored and {len(uncensored)} uncensored SNIs")
+
+    labels = classify.rule_labels()
+    output_file = open(output_filename, 'a+') if output_filename else sys.stdout
+    for i in np.flatnonzero(censored_masks):
+        c, u = int(censored_masks[i]), int(uncensored_masks[i])
+        output_file.write(f"{domains[i]} {infer(c, u)} {labels[c] or '-'} {labels[u] or '-'}\n")
+    if output_file is not sys.stdout:
+        output_file.close()
@@ -2,6 +2,7 @@
 
 import getopt
 import sys
+import os
 import glob
 
 from matplotlib.ticker import ScalarFormatter
@@ -15,10 +16,24 @@ from upsetplot import from_memberships
 
 from matplotlib import cm
 
+import classify
 import common
+import rulestore
 
 FIGSIZE = (common.COLUMNWIDTH, 2.0)
 
+# The test variant of each rule, by rule number (see classify.LABELS).
+DOMAINS_RULES = [
+    "domain",
+    "domain.{rnd}",
+    "domain{rnd}",
+    "{rnd}.domain",
+    "{rnd}domain",
+    "{rnd}.domain.{rnd}",
+    "{rnd}.domain{rnd}",
+    "{rnd}domain.{rnd}",
+    "{rnd}domain{rnd}",
+]
 
 
 def usage(f=sys.stderr):
@@ -30,6 +45,10 @@ This script reads from CSV files and plot . With no FILE, or when FILE is -, rea
   -h, --help            show this help
   -o, --out             write to file (default: rule-extraction.pdf)
   -n, --no-show         do not show the plot, just save as file
+  -g, --guangzhou=GLOB  the "domain rules" result files of Guangzhou (Henan)
+  -c, --california=GLOB the "domain rules" result files of California (GFW)
+  --cache=FILE          keep the parsed result files in FILE, and reuse it while the result
+                        files are unchanged
 
 Example:
   {program} --out figure.pdf
@@ -52,10 +71,79 @@ def input_files(args, binary=False):
                     with open(path, MODE) as f:
                         yield f
 
+def rule_names():
+    """
+    Return the UpSet category name of every rule bit, e.g. "Rule 2: domain.{rnd}".
+    """
+    return [f"Rule {label}: {DOMAINS_RULES[int(label) - 1]}" for label in classify.LABELS]
+
+def read_results(paths, values):
+    """
+    Return a frame with the Domain and rule mask of every domain in the
+    result files, keeping the first occurrence of a domain, like
+    drop_duplicates(subset=['Domain']).
+    """
+    domains = []
+    masks = []
+    for path in paths:
+        d, m = rulestore.read_result(path, values)
+        domains.extend(d)
+        masks.append(m)
+    masks = np.concatenate(masks) if masks else np.zeros(0, dtype=np.uint16)
+    first = ~pd.Index(domains).duplicated()
+    return pd.DataFrame({"Domain": np.array(domains, dtype=object)[first], "mask": masks[first]})
+
+def cache_key(paths):
+    """
+    Return the (path, size, mtime) of every file, to tell whether a cached
+    frame is still current.
+    """
+    key = []
+    for path in paths:
+        st = os.stat(path)
+        key.append((path, st.st_size, st.st_mtime_ns))
+    return key
+
+def load(files_by_city, cache_filename=None):
+    """
+    Return the frame of Domain, mask and city of the result files of every
+    city, each deduplicated on its own. With cache_filename, the frame is
+    read from that pickle if it was made from the same files, and written
+    to it otherwise.
+    """
+    key = [(city, cache_key(paths)) for city, paths in files_by_city]
+    if cache_filename and os.path.exists(cache_filename):
+        cached = pd.read_pickle(cache_filename)
+        if cached["key"] == key:
+            return cached["frame"]
+
+    values = rulestore.mask_values()
+    frames = []
+    for city, paths in files_by_city:
+        frame = read_results(paths, values)
+        frame["city"] = city
+        frames.append(frame)
+    df = pd.concat(frames, ignore_index=True)
+
+    if cache_filename:
+        pd.to_pickle({"key": key, "frame": df}, cache_filename)
+    return df
+
+def combination_counts(df):
+    """
+    Return the number of domains of every (rule combination, city), indexed
+    by rule membership for UpSet. Only the distinct combinations are
+    labelled.
+    """
+    counts = df.groupby(["mask", "city"], sort=True).size().reset_index(name="count")
+    names = rule_names()
+    memberships = [[names[k] for k in range(classify.NRULES) if m >> k & 1] for m in counts["mask"]]
+    return from_memberships(memberships, data=counts)
+
 
 if __name__ == '__main__':
     try:
-        opts, args = getopt.gnu_getopt(sys.argv[1:], "ho:ng:c:", ["help", "out=", "no-show", "guangzhou=", "california="])
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "ho:ng:c:", ["help", "out=", "no-show", "guangzhou=", "california=", "cache="])
     except getopt.GetoptError as err:
         eprint(err)
         usage()
@@ -63,6 +151,7 @@ if __name__ == '__main__':
 
     output_filename = "rule-extraction.pdf"
     show_plot = True
+    cache_filename = None
     for o, a in opts:
         if o == "-h" or o == "--help":
             usage()
@@ -75,69 +164,31 @@ if __name__ == '__main__':
             guangzhou_csv_files = glob.glob(a)
         if o == "-c" or o == "--california":
             california_csv_files = glob.glob(a)
-            
-
-    guanzhou_dataframes = []
-    for csv_file in guangzhou_csv_files:
-        dataframe = pd.read_csv(csv_file, sep=" ", header=None, names=["Domain", "Categories"])
-        if not dataframe.empty:
-            guanzhou_dataframes.append(dataframe)
-
-    guangzhou_df = pd.concat(guanzhou_dataframes)
-    guangzhou_df = guangzhou_df.drop_duplicates(subset=['Domain'])
-
-
-    california_dataframes = []
-    for csv_file in california_csv_files:
-        dataframe = pd.read_csv(csv_file, sep=" ", header=None, names=["Domain", "Categories"])
-        if not dataframe.empty:
-            california_dataframes.append(dataframe)
-
-    california_df = pd.concat(california_dataframes)
-    california_df = california_df.drop_duplicates(subset=['Domain'])
+        if o == "--cache":
+            cache_filename = a
 
+    df = load([("Henan", guangzhou_csv_files), ("GFW", california_csv_files)], cache_filename)
 
     # Finding common domains
-    common_domains = pd.merge(california_df, guangzhou_df, on='Domain')
+    labels = np.array(classify.rule_labels(), dtype=object)
+    cities = df.assign(Categories=labels[df["mask"]]).groupby("city", sort=False)
+    common_domains = pd.merge(cities.get_group("GFW")[["Domain", "Categories"]],
+                              cities.get_group("Henan")[["Domain", "Categories"]], on='Domain')
     print(common_domains.head(50))
 
-
-
-
-
-    guangzhou_df['city'] = 'Henan'
-    california_df['city'] = 'GFW'
-
-    df = pd.concat([guangzhou_df, california_df])
-
-    domains_rules = [
-    "domain",
-    "domain.{rnd}",
-    "domain{rnd}",
-    "{rnd}.domain",
-    "{rnd}domain",
-    "{rnd}.domain.{rnd}",
-    "{rnd}.domain{rnd}",
-    "{rnd}domain.{rnd}",
-    "{rnd}domain{rnd}",
-    ]
-
-
-    df['Categories'] = df['Categories'].astype(str)
-
-    by_rule = from_memberships(df.Categories.str.split(",").apply(lambda x: [ 'Rule '+str(int(y))+': ' + domains_rules[int(y)-1] for y in x]), data=df)
+    by_rule = combination_counts(df)
     # UpSet(by_rule)
 
     # fig, axes = plt.subplots(figsize=FIGSIZE)
 
     fig = plt.figure(figsize=FIGSIZE)
 
-    upset = UpSet(by_rule, min_subset_size=15, show_percentages=True, intersection_plot_elements=0,facecolor='black')
+    upset = UpSet(by_rule, sum_over="count", min_subset_size=15, show_percentages=True, intersection_plot_elements=0,facecolor='black')
 
     # black and gray cm colors:
 
     upset.add_stacked_bars(
-        by="city", title="Rule Combination Overlap", elements=5,colors=['#808080', '#000000']
+        by="city", sum_over="count", title="Rule Combination Overlap", elements=5,colors=['#808080', '#000000']
     )
     upset.plot(fig=fig)
 
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import getopt
+import glob
+import re
+
+import numpy as np
+
+import classify
+
+# A rule store holds the "domain rules" result files of one vantage point
+# (see classify.py) as three files sharing a prefix:
+#
+#   PREFIX.npy          uint16 matrix of shape (domains, dates). Bit k of
+#                       an entry is set if variant k of the domain was
+#                       blocked on that date; 0 means the domain is not in
+#                       that date's result file.
+#   PREFIX-domains.txt  the domain string table, one per line, in C-locale
+#                       order. The line number is the row.
+#   PREFIX-dates.txt    the dates (YYYY-MM-DD), one per line, in column order.
+#
+# The matrix is opened with mmap. The store is rebuilt when a result file
+# is newer than it or the set of dates changes.
+
+DATE_REGEX = re.compile(r"(\d{4}-\d{2}-\d{2})_result\.txt$")
+
+def usage(f=sys.stderr):
+    program = sys.argv[0]
+    f.write(f"""\
+Usage: {program} PREFIX FILENAME...
+This script builds a rule store (a domain x date matrix of rule masks) from "domain rules"
+result files, one per date, named *_YYYY-MM-DD_result.txt.
+
+  -h, --help            show this help
+
+Example:
+  {program} gfw-rules 'results/censored-block-rules-california_*_result.txt'
+""")
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+def domains_path(prefix):
+    return prefix + "-domains.txt"
+
+def dates_path(prefix):
+    return prefix + "-dates.txt"
+
+def masks_path(prefix):
+    return prefix + ".npy"
+
+def result_files(patterns):
+    """
+    Expand glob patterns into a list of (date, path) pairs sorted by date.
+    Files without a date in their name are skipped.
+    """
+    files = {}
+    for pattern in patterns:
+        for path in glob.glob(pattern):
+            match = DATE_REGEX.search(os.path.basename(path))
+            if match:
+                files[match.group(1)] = path
+    return sorted(files.items())
+
+def mask_values():
+    """
+    Return a dict from rule labels (e.g. "1,4") to mask values.
+    """
+    return {label: m for m, label in enumerate(classify.rule_labels()) if m}
+
+def read_result(path, values):
+    """
+    Return the (domains, masks) of one result file.
+    """
+    domains = []
+    masks = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 2:
+                continue
+            try:
+                mask = values[fields[1]]
+            except KeyError:
+                raise ValueError(f"{path}: unknown rule label {fields[1]!r}") from None
+            domains.append(fields[0])
+            masks.append(mask)
+    return domains, np.array(masks, dtype=np.uint16)
+
+def build(prefix, files):
+    """
+    Build a store at prefix from a list of (date, path) pairs, replacing
+    any existing store.
+    """
+    values = mask_values()
+    days = [read_result(path, values) for _, path in files]
+    domains = sorted(set().union(*(d for d, _ in days)), key=lambda d: d.encode("utf-8"))
+    index = {d: i for i, d in enumerate(domains)}
+
+    masks = np.lib.format.open_memmap(masks_path(prefix), mode="w+", dtype=np.uint16, shape=(len(domains), len(days)))
+    for j, (day_domains, day_masks) in enumerate(days):
+        ids = np.fromiter((index[d] for d in day_domains), dtype=np.int64, count=len(day_domains))
+        masks[ids, j] = day_masks
+    masks.flush()
+    del masks
+
+    with open(domains_path(prefix), 'w', encoding='utf-8') as f:
+        for domain in domains:
+            f.write(domain + "\n")
+    with open(dates_path(prefix), 'w') as f:
+        for d, _ in files:
+            f.write(d + "\n")
+
+def is_current(prefix, files):
+    """
+    Return whether the store at prefix exists, holds exactly the dates of
+    files, and is newer than all of them.
+    """
+    try:
+        mtime = os.path.getmtime(masks_path(prefix))
+        with open(dates_path(prefix), 'r') as f:
+            dates = f.read().splitlines()
+    except OSError:
+        return False
+    return dates == [d for d, _ in files] and all(os.path.getmtime(path) <= mtime for _, path in files)
+
+class RuleStore:
+    """
+    A read-only, memory-mapped view of a rule store.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.masks = np.load(masks_path(prefix), mmap_mode="r")
+        with open(domains_path(prefix), 'r', encoding='utf-8') as f:
+            self.domains = f.read().splitlines()
+        with open(dates_path(prefix), 'r') as f:
+            self.dates = f.read().splitlines()
+
+    @classmethod
+    def open(cls, prefix, files=None):
+        """
+        Open the store at prefix, first (re)building it from the (date,
+        path) pairs in files if it is not current.
+        """
+        if files is not None and not is_current(prefix, files):
+            build(prefix, files)
+        return cls(prefix)
+
+    def combinations(self):
+        """
+        Return (counts, first): for every mask value, the number of
+        (domain, date) entries with exactly that rule combination, and the
+        position of its first occurrence in date-major order (dates, then
+        domains), or -1.
+        """
+        flat = np.asarray(self.masks).T.ravel()
+        counts = np.bincount(flat, minlength=1 << classify.NRULES)
+        counts[0] = 0
+        present = np.flatnonzero(flat)
+        values, first = np.unique(flat[present], return_index=True)
+        first_pos = np.full(len(counts), -1, dtype=np.int64)
+        first_pos[values] = present[first]
+        return counts, first_pos
+
+    def marginals(self):
+        """
+        Return, for every rule k, the number of (domain, date) entries
+        with bit k set.
+        """
+        counts = np.bincount(np.asarray(self.masks).ravel(), minlength=1 << classify.NRULES)
+        bits = (np.arange(len(counts))[:, None] >> np.arange(classify.NRULES)) & 1
+        return counts @ bits
+
+    def changes(self):
+        """
+        Return (added, removed, changed) arrays with one entry per date
+        after the first: the number of domains that entered the result,
+        left it, and stayed but changed rule combination since the
+        previous date.
+        """
+        m = np.asarray(self.masks)
+        before, after = m[:, :-1], m[:, 1:]
+        added = np.count_nonzero((before == 0) & (after != 0), axis=0)
+        removed = np.count_nonzero((before != 0) & (after == 0), axis=0)
+        changed = np.count_nonzero((before != 0) & (after != 0) & (before != after), axis=0)
+        return added, removed, changed
+
+if __name__ == '__main__':
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "h", ["help"])
+    except getopt.GetoptError as err:
+        eprint(err)
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            usage()
+            sys.exit(0)
+
+    if len(args) < 2:
+        usage()
+        sys.exit(2)
+
+    prefix, patterns = args[0], args[1:]
+    files = result_files(patterns)
+    if not files:
+        eprint("No matching files found. Exiting.")
+        sys.exit(1)
+    build(prefix, files)
+    eprint(f"{prefix}: {len(files)} dates, {files[0][0]} to {files[-1][0]}")
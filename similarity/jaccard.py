@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import getopt
+import csv
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+import presence
+
+# Rows of the first store are ANDed against all rows of the second this many
+# at a time, bounding the temporary to BLOCK_DAYS x days x stride bytes.
+BLOCK_DAYS = 8
+
+def usage(f=sys.stderr):
+    program = sys.argv[0]
+    f.write(f"""\
+Usage: {program} [OPTIONS] PREFIX [PREFIX]
+This script computes the intersection, union and Jaccard similarity of the blocklists of every
+pair of days, from presence stores (see ../data/presence.py). With one store, it compares every
+day with every other day of that store; with two, every day of the first with every day of the
+second, matching domains by name.
+
+  -h, --help            show this help
+  -o, --out             write the matrices to this .npz file (default: jaccard.npz)
+  -c, --csv=FILE        also write the Jaccard matrix as CSV, one row per day of the first store
+
+The .npz file holds rows and columns (the dates, as YYYY-MM-DD strings), and intersection,
+union and jaccard, each of shape (len(rows), len(columns)).
+
+Example:
+  {program} --out jaccard-gfw.npz ../data/gfw-presence
+  {program} --out jaccard-gfw-henan.npz ../data/gfw-presence ../data/henan-presence
+""")
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+def aligned_bits(a, b):
+    """
+    Return the packed rows of stores a and b over a shared domain space.
+    Domain IDs of a are kept; domains of b that are not in a are given
+    IDs after them.
+    """
+    index = {d: i for i, d in enumerate(a.domains)}
+    for d in b.domains:
+        index.setdefault(d, len(index))
+    stride = (len(index) + 7) // 8
+    remap = np.fromiter((index[d] for d in b.domains), dtype=np.int64, count=len(b.domains))
+
+    bits_a = np.zeros((len(a.dates), stride), dtype=np.uint8)
+    # a.bits may carry zero headroom columns past the last domain.
+    width = min(a.bits.shape[1], stride)
+    bits_a[:, :width] = a.bits[:, :width]
+    bits_b = np.zeros((len(b.dates), stride), dtype=np.uint8)
+    for start in range(0, len(b.dates), presence.CHUNK_DAYS):
+        rows = b.rows(start, start + presence.CHUNK_DAYS)
+        unpacked = np.zeros((len(rows), stride * 8), dtype=np.uint8)
+        unpacked[:, remap] = rows
+        bits_b[start:start + len(rows)] = np.packbits(unpacked, axis=1, bitorder="little")
+    return bits_a, bits_b
+
+def popcount_rows(bits):
+    """
+    Return the number of set bits in every row of a packed matrix.
+    """
+    return np.bitwise_count(bits).sum(axis=1, dtype=np.int64)
+
+def intersections(bits_a, bits_b):
+    """
+    Return the (len(bits_a), len(bits_b)) matrix of the number of bits set
+    in both rows of every pair.
+    """
+    out = np.zeros((len(bits_a), len(bits_b)), dtype=np.int64)
+    for start in range(0, len(bits_a), BLOCK_DAYS):
+        both = bits_a[start:start + BLOCK_DAYS, None, :] & bits_b[None, :, :]
+        out[start:start + BLOCK_DAYS] = np.bitwise_count(both).sum(axis=2, dtype=np.int64)
+    return out
+
+def similarity(bits_a, bits_b):
+    """
+    Return (intersection, union, jaccard) of every pair of rows. Pairs
+    where both days are empty have a Jaccard similarity of 1.
+    """
+    inter = intersections(bits_a, bits_b)
+    union = popcount_rows(bits_a)[:, None] + popcount_rows(bits_b)[None, :] - inter
+    with np.errstate(invalid="ignore", divide="ignore"):
+        jaccard = np.where(union > 0, inter / union, 1.0)
+    return inter, union, jaccard
+
+if __name__ == '__main__':
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "ho:c:", ["help", "out=", "csv="])
+    except getopt.GetoptError as err:
+        eprint(err)
+        usage()
+        sys.exit(2)
+
+    output_filename = "jaccard.npz"
+    csv_filename = None
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            usage()
+            sys.exit(0)
+        elif o in ("-o", "--out"):
+            output_filename = a
+        elif o in ("-c", "--csv"):
+            csv_filename = a
+
+    if len(args) not in (1, 2):
+        usage()
+        sys.exit(2)
+
+    a = presence.PresenceStore(args[0])
+    if len(args) == 1:
+        b = a
+        bits_a = bits_b = np.asarray(a.bits)
+    else:
+        b = presence.PresenceStore(args[1])
+        bits_a, bits_b = aligned_bits(a, b)
+
+    inter, union, jaccard = similarity(bits_a, bits_b)
+    np.savez(output_filename, rows=np.array(a.dates), columns=np.array(b.dates),
+             intersection=inter, union=union, jaccard=jaccard)
+
+    if csv_filename:
+        with open(csv_filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["date"] + b.dates)
+            for d, row in zip(a.dates, jaccard):
+                writer.writerow([d] + [f"{x:.6f}" for x in row])
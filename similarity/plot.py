@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+import getopt
+import sys
+
+import matplotlib.dates as mdates
+import matplotlib.pyplot as plt
+import numpy as np
+
+import common
+
+FIGSIZE = (common.COLUMNWIDTH, 2.6)
+
+def usage(f=sys.stderr):
+    program = sys.argv[0]
+    f.write(f"""\
+Usage: {program} [OPTIONS] FILE.npz
+This script plots the day x day Jaccard similarity matrix written by jaccard.py as a heatmap.
+
+  -h, --help            show this help
+  -o, --out             write to file (default: figure.pdf)
+  -n, --no-show         do not show the plot, just save as file
+  --xlabel=LABEL        label of the x axis (columns) (default: Date)
+  --ylabel=LABEL        label of the y axis (rows) (default: Date)
+
+Example:
+  {program} --xlabel Henan --ylabel GFW --out jaccard-gfw-henan.pdf jaccard-gfw-henan.npz
+""")
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+if __name__ == '__main__':
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "ho:n", ["help", "out=", "no-show", "xlabel=", "ylabel="])
+    except getopt.GetoptError as err:
+        eprint(err)
+        usage()
+        sys.exit(2)
+
+    output_filename = "figure.pdf"
+    show_plot = True
+    xlabel = "Date"
+    ylabel = "Date"
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            usage()
+            sys.exit(0)
+        elif o in ("-o", "--out"):
+            output_filename = a
+        elif o in ("-n", "--no-show"):
+            show_plot = False
+        elif o == "--xlabel":
+            xlabel = a
+        elif o == "--ylabel":
+            ylabel = a
+
+    if len(args) != 1:
+        usage()
+        sys.exit(2)
+
+    with np.load(args[0]) as npz:
+        rows = npz["rows"].astype("datetime64[D]")
+        columns = npz["columns"].astype("datetime64[D]")
+        jaccard = npz["jaccard"]
+
+    # Days without a snapshot are left blank, so that the axes are linear in time.
+    row_days = (rows - rows[0]).astype(int)
+    column_days = (columns - columns[0]).astype(int)
+    grid = np.full((row_days[-1] + 1, column_days[-1] + 1), np.nan)
+    grid[np.ix_(row_days, column_days)] = jaccard
+
+    eprint(f"Jaccard similarity: mean={np.nanmean(jaccard):.3f}, min={np.nanmin(jaccard):.3f}, max={np.nanmax(jaccard):.3f}")
+
+    fig = plt.figure(figsize=FIGSIZE)
+    ax = plt.axes()
+
+    extent = [
+        mdates.date2num(columns[0]), mdates.date2num(columns[-1] + 1),
+        mdates.date2num(rows[-1] + 1), mdates.date2num(rows[0]),
+    ]
+    image = ax.imshow(grid, cmap="Oranges", vmin=0, vmax=1, extent=extent,
+                      interpolation="nearest", aspect="auto")
+    fig.colorbar(image, ax=ax, label="Jaccard similarity")
+
+    for axis in (ax.xaxis, ax.yaxis):
+        axis.set_major_locator(mdates.MonthLocator(bymonth=(1, 7)))
+        axis.set_major_formatter(mdates.DateFormatter("%Y-%m"))
+    plt.xticks(rotation=45, ha="right")
+    ax.set(xlabel=xlabel, ylabel=ylabel)
+    ax.grid(False)
+
+    fig.subplots_adjust(left=0.27, bottom=0.3, right=0.9, top=0.97)
+
+    # remove pdf metadata
+    fig.savefig(output_filename, dpi=300, metadata={"CreationDate": None})
+
+    if show_plot:
+        plt.show()
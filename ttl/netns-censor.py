@@ -0,0 +1,28 @@
+import argparse
+from scapy.all import *
+from scapy.layers.inet import IP, TCP
+
+# An on-path censor for netns-test.sh. It watches the packets that arrive
+# at one router of the test path and, for every TLS ClientHello that
+# carries the blocked SNI, injects a RST/ACK to the client spoofed from the
+# server, as the GFW does. The packet itself is still forwarded.
+
+def inject_rst(packet, sni):
+    if not packet.haslayer(Raw) or sni not in bytes(packet[Raw].load):
+        return
+    ip, tcp = packet[IP], packet[TCP]
+    rst = IP(src=ip.dst, dst=ip.src, ttl=64) / \
+        TCP(sport=tcp.dport, dport=tcp.sport, flags='RA', seq=tcp.ack, ack=tcp.seq + len(tcp.payload))
+    send(rst, verbose=False)
+    print(f"RST to {ip.src}:{tcp.sport} (ttl {ip.ttl} on arrival)", flush=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inject RSTs for ClientHellos with a blocked SNI")
+    parser.add_argument("interface", type=str, help="Interface facing the client")
+    parser.add_argument("sni", type=str, help="Blocked SNI")
+    parser.add_argument("--port", type=int, default=443, help="Server port (default: 443)")
+    args = parser.parse_args()
+
+    sni = args.sni.encode()
+    sniff(iface=args.interface, filter=f"tcp dst port {args.port} and tcp[tcpflags] & tcp-push != 0",
+          prn=lambda packet: inject_rst(packet, sni), store=False)
@@ -0,0 +1,82 @@
+#!/bin/bash
+
+# This script tests ttl-limiting-probe-tls.py without a real censor. It
+# builds a path of network namespaces,
+#
+#   client -- router 1 -- router 2 -- ... -- router HOPS -- server
+#
+# where the routers decrement the TTL and send ICMP time-exceeded
+# messages, runs netns-censor.py on router CENSOR_HOP to inject RSTs for
+# ClientHellos with the SNI, and probes the server from the client. The
+# probe should report "Censor hop: TTL CENSOR_HOP". The server listens on
+# no port, so probes that reach it are answered with RSTs by its kernel.
+#
+# Run it as root, like this:
+# sudo ./netns-test.sh 8 5 youtube.com --parallel
+
+cd "$(dirname "$0")" || exit
+
+if [ "$#" -lt 3 ]; then
+    echo "Usage: $0 <hops> <censor_hop> <sni> [probe options...]"
+    exit 1
+fi
+
+hops=$1
+censor_hop=$2
+sni=$3
+shift 3
+
+if [ "$censor_hop" -lt 1 ] || [ "$censor_hop" -gt "$hops" ]; then
+    echo "The censor hop must be between 1 and $hops"
+    exit 1
+fi
+
+# Namespace i is the client for i = 0, router i for 1 <= i <= hops, and the
+# server for i = hops + 1. The link between namespaces i and i + 1 is
+# 10.200.i.0/24, with 10.200.i.1 on the side of namespace i.
+ns() {
+    echo "ttl-test-$1"
+}
+
+cleanup() {
+    [ -n "$censor_pid" ] && kill "$censor_pid" 2>/dev/null
+    for i in $(seq 0 $((hops + 1))); do
+        ip netns del "$(ns "$i")" 2>/dev/null
+    done
+}
+trap cleanup EXIT
+
+for i in $(seq 0 $((hops + 1))); do
+    ip netns add "$(ns "$i")" || exit
+    ip -n "$(ns "$i")" link set lo up
+done
+
+for i in $(seq 0 "$hops"); do
+    ip link add "l$i-a" netns "$(ns "$i")" type veth peer name "l$i-b" netns "$(ns $((i + 1)))"
+    ip -n "$(ns "$i")" addr add "10.200.$i.1/24" dev "l$i-a"
+    ip -n "$(ns $((i + 1)))" addr add "10.200.$i.2/24" dev "l$i-b"
+    ip -n "$(ns "$i")" link set "l$i-a" up
+    ip -n "$(ns $((i + 1)))" link set "l$i-b" up
+done
+
+# Towards the server through the next hop, back to the client through the
+# previous one.
+ip -n "$(ns 0)" route add default via 10.200.0.2
+for i in $(seq 1 "$hops"); do
+    ip netns exec "$(ns "$i")" sysctl -qw net.ipv4.ip_forward=1
+    # Answer every expired probe, however many arrive at once.
+    ip netns exec "$(ns "$i")" sysctl -qw net.ipv4.icmp_ratelimit=0
+    ip -n "$(ns "$i")" route add default via "10.200.$i.2"
+    for j in $(seq 0 $((i - 2))); do
+        ip -n "$(ns "$i")" route add "10.200.$j.0/24" via "10.200.$((i - 1)).1"
+    done
+done
+ip -n "$(ns $((hops + 1)))" route add default via "10.200.$hops.1"
+
+server="10.200.$hops.2"
+
+ip netns exec "$(ns "$censor_hop")" python3 netns-censor.py "l$((censor_hop - 1))-b" "$sni" &
+censor_pid=$!
+sleep 2
+
+ip netns exec "$(ns 0)" python3 ttl-limiting-probe-tls.py --max-ttl $((hops + 2)) "$@" "$server" "$sni"
@@ -1,4 +1,5 @@
 import os
+import sys
 import time
 import argparse
 from scapy.all import *
@@ -7,7 +8,19 @@ from scapy.layers.tls.extensions import TLS_Ext_ServerName, ServerName
 from scapy.layers.tls.record import TLS
 from scapy.layers.inet import IP, TCP
 
-def send_syn_and_client_hello(ip_address, hostname, ttl=64, dst_port=443):
+def client_hello(hostname):
+    sni = ServerName(servername=hostname)
+    extensions = TLS_Ext_ServerName(servernames=[sni])
+    
+    cipher_suites = [0x1301, 0x1302, 0x1303, 0xc02b, 0xc02c, 0xc02f, 0xc030, 0xcca9, 0xcca8, 0xc013, 0xc014, 0x009c, 0x009d, 0x002f, 0x0035, 0x000a, 0x009f]
+    
+    client_random = os.urandom(32)
+    
+    client_hello = TLSClientHello(version=0x0303, gmt_unix_time=int(time.time()), random_bytes=client_random, ciphers=cipher_suites, ext=[extensions])
+    
+    return TLS(type=0x16, version=0x0301, msg=[client_hello])
+
+def send_syn_and_client_hello(ip_address, hostname, ttl=64, dst_port=443, timeout=5):
     print(f"TTL {ttl}: Starting sniffing before sending packets...")
     sniff_thread = AsyncSniffer(filter=f"src {ip_address}", store=True)
     sniff_thread.start()
@@ -35,21 +48,12 @@ def send_syn_and_client_hello(ip_address, hostname, ttl=64, dst_port=443):
     
     tcp_client_hello = TCP(sport=src_port, dport=dst_port, flags='PA', seq=1001, ack=1)
     
-    sni = ServerName(servername=hostname)
-    extensions = TLS_Ext_ServerName(servernames=[sni])
-    
-    cipher_suites = [0x1301, 0x1302, 0x1303, 0xc02b, 0xc02c, 0xc02f, 0xc030, 0xcca9, 0xcca8, 0xc013, 0xc014, 0x009c, 0x009d, 0x002f, 0x0035, 0x000a, 0x009f]
-    
-    client_random = os.urandom(32)
-    
-    client_hello = TLSClientHello(version=0x0303, gmt_unix_time=int(time.time()), random_bytes=client_random, ciphers=cipher_suites, ext=[extensions])
-    
-    tls_record = TLS(type=0x16, version=0x0301, msg=[client_hello])
+    tls_record = client_hello(hostname)
     
     send(ip_layer / tcp_client_hello / tls_record, verbose=False)
     
-    print(f"TTL {ttl}: Waiting for packets (timeout 5 seconds)...")
-    time.sleep(5)
+    print(f"TTL {ttl}: Waiting for packets (timeout {timeout} seconds)...")
+    time.sleep(timeout)
     sniff_thread.stop()
     
     responses = sniff_thread.results
@@ -66,16 +70,112 @@ def send_syn_and_client_hello(ip_address, hostname, ttl=64, dst_port=443):
 
     return False
 
+def attribute(packet, ip_address, base_port, max_ttl):
+    """
+    Return the TTL of the probe that packet answers, and what it is: "icmp"
+    for an ICMP time-exceeded message, whose quoted TCP header carries the
+    source port of the probe, "server" for the server's answer to the SYN,
+    or "rst" for another RST. Return None for other packets.
+    """
+    if packet.haslayer(ICMP) and packet[ICMP].type == 11 and packet.haslayer(TCPerror):
+        if packet[IPerror].dst != ip_address:
+            return None
+        ttl = packet[TCPerror].sport - base_port
+        kind = "icmp"
+    elif packet.haslayer(TCP) and packet[IP].src == ip_address:
+        ttl = packet[TCP].dport - base_port
+        flags = packet[TCP].flags
+        if flags & 0x10 and packet[TCP].ack == 1001:  # ACK of the SYN
+            kind = "server"
+        elif flags & 0x04:  # RST
+            kind = "rst"
+        else:
+            return None
+    else:
+        return None
+    if not 1 <= ttl <= max_ttl:
+        return None
+    return ttl, kind
+
+def probe_all_ttls(ip_address, hostname, max_ttl=63, dst_port=443, base_port=45000, timeout=5):
+    """
+    Send the SYN and ClientHello of every TTL from 1 to max_ttl at once, the
+    probe of TTL t from source port base_port + t, and attribute the answers
+    to the probes. Return a dict mapping each TTL to the (kind, packet) of
+    its answers (see attribute()).
+    """
+    print(f"TTL 1-{max_ttl}: Starting sniffing before sending packets...")
+    sniff_thread = AsyncSniffer(filter=f"(tcp and src {ip_address}) or (icmp and icmp[0] == 11)", store=True)
+    sniff_thread.start()
+    time.sleep(0.1)
+
+    tls_record = client_hello(hostname)
+    send([IP(dst=ip_address, ttl=ttl) / TCP(sport=base_port + ttl, dport=dst_port, flags='S', seq=1000)
+          for ttl in range(1, max_ttl + 1)], verbose=False)
+
+    time.sleep(1)
+
+    send([IP(dst=ip_address, ttl=ttl) / TCP(sport=base_port + ttl, dport=dst_port, flags='PA', seq=1001, ack=1) / tls_record
+          for ttl in range(1, max_ttl + 1)], verbose=False)
+
+    print(f"TTL 1-{max_ttl}: Waiting for packets (timeout {timeout} seconds)...")
+    time.sleep(timeout)
+    sniff_thread.stop()
+
+    answers = {ttl: [] for ttl in range(1, max_ttl + 1)}
+    for packet in sniff_thread.results:
+        attributed = attribute(packet, ip_address, base_port, max_ttl)
+        if attributed:
+            ttl, kind = attributed
+            answers[ttl].append((kind, packet))
+    return answers
+
+def report(answers):
+    """
+    Print the answers of every TTL and the hop of the censor: the lowest
+    TTL whose ClientHello was answered with a RST, if the SYN of that TTL
+    did not reach the server.
+    """
+    censor_ttl = server_ttl = None
+    for ttl, packets in sorted(answers.items()):
+        for kind, packet in packets:
+            if kind == "icmp":
+                probe = "SYN" if packet[TCPerror].seq == 1000 else "ClientHello"
+                print(f"TTL {ttl}: ICMP time exceeded from {packet[IP].src} for the {probe}.")
+            elif kind == "server":
+                print(f"TTL {ttl}: Received {packet[TCP].flags} packet from the server for the SYN.")
+                server_ttl = server_ttl or ttl
+            else:
+                tcp = packet[TCP]
+                print(f"TTL {ttl}: Received RST packet (flags {tcp.flags}, seq {tcp.seq}, ack {tcp.ack}, "
+                      f"ttl {packet[IP].ttl}, id {packet[IP].id}, window {tcp.window}).")
+                censor_ttl = censor_ttl or ttl
+        if not packets:
+            print(f"TTL {ttl}: No packet received.")
+    print("--------------------------------------")
+    if censor_ttl and (server_ttl is None or censor_ttl < server_ttl):
+        print(f"Censor hop: TTL {censor_ttl}")
+    elif server_ttl:
+        print(f"No RST packet received before the server, reached at TTL {server_ttl}.")
+    else:
+        print("No RST packet received.")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="TCP and TLS probing script")
     parser.add_argument("ip_address", type=str, help="Target IP address")
     parser.add_argument("sni", type=str, help="SNI")
+    parser.add_argument("--parallel", action="store_true", help="Send all TTLs at once, each from its own source port")
+    parser.add_argument("--max-ttl", type=int, default=63, help="Highest TTL to probe (default: 63)")
+    parser.add_argument("--timeout", type=float, default=5, help="Seconds to wait for answers to the ClientHello (default: 5)")
     args = parser.parse_args()
     
-    for ttl in range(1, 64):  
+    if args.parallel:
+        report(probe_all_ttls(args.ip_address, args.sni, args.max_ttl, timeout=args.timeout))
+        sys.exit(0)
+
+    for ttl in range(1, args.max_ttl + 1):  
         print(f"Running experiment with TTL = {ttl}")
-        cont = send_syn_and_client_hello(args.ip_address, args.sni, ttl)
+        cont = send_syn_and_client_hello(args.ip_address, args.sni, ttl, timeout=args.timeout)
         print("--------------------------------------")
         if cont:
             break
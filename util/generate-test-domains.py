@@ -3,6 +3,7 @@
 import sys
 import getopt
 import glob
+import struct
 
 def usage(f=sys.stderr):
     program = sys.argv[0]
@@ -12,7 +13,16 @@ This script reads domain names from files and write the domain names to test in
 
   -h, --help            show this help
   -o, --out             write to file
-  -r, --random          the random string for appending or prepending to the domain (default: ZZZZ)
+  -r, --random          the random string for appending or prepending to the domain (default: ZZZZ);
+                        may be given more than once, to generate the templates with each string
+  -t, --template=T      a variant template, with {{domain}} standing for the base domain and {{random}}
+                        for the random string; may be given more than once (default: the 9 rule
+                        templates below)
+  -T, --templates=FILE  read variant templates from FILE, one per line
+  -u, --unique          write every test domain only once, even if several base domains or
+                        templates produce it (note that rule-parser.sh expects 9 lines per base)
+  -B, --binary-out      write each test domain as a 2-byte little-endian length followed by the
+                        name, with no newlines
 
 Example:
   Generate testing domains for the censored domain youtube.com:
@@ -29,6 +39,9 @@ Example:
 
   Create a pipelie to generate and test domains:
     grep TLS,EOF 1m.csv | cut -d, -f2 | {program} | ./snicensor
+
+  Test label-boundary variants with two random strings:
+    {program} -r ZZZZ -r 0 -t '{{random}}.{{domain}}' -t '{{random}}-{{domain}}' < domains.txt
 """)
 
 def eprint(*args, **kwargs):
@@ -48,51 +61,137 @@ def input_files(args, binary=False):
                     with open(path, MODE) as f:
                         yield f
 
-def generate_domain(base_domain, random_str):
-    # Rule 0 censored_domain
-    # Rule 1 censored_domain{.rnd_str}
-    # Rule 2 censored_domain{rnd_str}
-    # Rule 3 {rnd_str.}censored_domain
-    # Rule 4 {rnd_str}censored_domain
-    # Rule 5 {rnd_str.}censored_domain{.rnd_str}
-    # Rule 6 {rnd_str.}censored_domain{rnd_str}
-    # Rule 7 {rnd_str}censored_domain{.rnd_str}
-    # Rule 8 {rnd_str}censored_domain{rnd_str}
-    yield base_domain
-    yield f"{base_domain}.{random_str}"
-    yield f"{base_domain}{random_str}"
-    yield f"{random_str}.{base_domain}"
-    yield f"{random_str}{base_domain}"
-    yield f"{random_str}.{base_domain}.{random_str}"
-    yield f"{random_str}.{base_domain}{random_str}"
-    yield f"{random_str}{base_domain}.{random_str}"
-    yield f"{random_str}{base_domain}{random_str}"
+# Rule 0 censored_domain
+# Rule 1 censored_domain{.rnd_str}
+# Rule 2 censored_domain{rnd_str}
+# Rule 3 {rnd_str.}censored_domain
+# Rule 4 {rnd_str}censored_domain
+# Rule 5 {rnd_str.}censored_domain{.rnd_str}
+# Rule 6 {rnd_str.}censored_domain{rnd_str}
+# Rule 7 {rnd_str}censored_domain{.rnd_str}
+# Rule 8 {rnd_str}censored_domain{rnd_str}
+TEMPLATES = [
+    "{domain}",
+    "{domain}.{random}",
+    "{domain}{random}",
+    "{random}.{domain}",
+    "{random}{domain}",
+    "{random}.{domain}.{random}",
+    "{random}.{domain}{random}",
+    "{random}{domain}.{random}",
+    "{random}{domain}{random}",
+]
+
+# Base domains whose variants are joined and written in one call.
+BATCH_DOMAINS = 4096
+
+def affixes(templates, random_strs):
+    """
+    Expand templates into the (prefix, suffix) that each variant puts
+    around the base domain. Templates that use {random} are expanded once
+    per random string.
+    """
+    out = []
+    for template in templates:
+        if template.count("{domain}") != 1:
+            raise ValueError(f"template must contain {{domain}} exactly once: {template}")
+        for random_str in (random_strs if "{random}" in template else random_strs[:1]):
+            prefix, suffix = template.replace("{random}", random_str).split("{domain}")
+            out.append((prefix, suffix))
+    return out
+
+def generate_domain(base_domain, random_str, templates=TEMPLATES):
+    for prefix, suffix in affixes(templates, [random_str]):
+        yield prefix + base_domain + suffix
+
+def generate_batches(base_domains, rules, unique=False):
+    """
+    Yield lists of test domains, BATCH_DOMAINS base domains at a time.
+    rules is a list of (prefix, suffix) pairs from affixes().
+    """
+    seen = set() if unique else None
+    batch = []
+    n = 0
+    for base_domain in base_domains:
+        for prefix, suffix in rules:
+            domain = prefix + base_domain + suffix
+            if seen is not None:
+                if domain in seen:
+                    continue
+                seen.add(domain)
+            batch.append(domain)
+        n += 1
+        if n == BATCH_DOMAINS:
+            yield batch
+            batch = []
+            n = 0
+    if batch:
+        yield batch
+
+def base_domains(files):
+    for f in files:
+        for line in f:
+            base_domain = line.strip()
+            if base_domain:
+                yield base_domain
+
+def write_text(f, batches):
+    for batch in batches:
+        f.write("\n".join(batch))
+        f.write("\n")
+
+def write_binary(f, batches):
+    for batch in batches:
+        out = bytearray()
+        for domain in batch:
+            name = domain.encode("utf-8")
+            out += struct.pack("<H", len(name))
+            out += name
+        f.write(out)
 
 
 if __name__ == '__main__':
     try:
-        opts, args = getopt.gnu_getopt(sys.argv[1:], "ho:r:", ["help", "out=", "random="])
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "ho:r:t:T:uB", ["help", "out=", "random=", "template=", "templates=", "unique", "binary-out"])
     except getopt.GetoptError as err:
         eprint(err)
         usage()
         sys.exit(2)
 
-    output_file = sys.stdout
-    random_str = "ZZZZ"
+    output_filename = None
+    random_strs = []
+    templates = []
+    unique = False
+    binary_output = False
     for o, a in opts:
         if o == "-h" or o == "--help":
             usage()
             sys.exit(0)
         if o == "-o" or o == "--out":
-            output_file = open(a, 'a+')
+            output_filename = a
         if o == "-r" or o == "--random":
-            random_str = a
+            random_strs.append(a)
+        if o == "-t" or o == "--template":
+            templates.append(a)
+        if o == "-T" or o == "--templates":
+            with open(a, 'r') as f:
+                templates.extend(line.rstrip("\n") for line in f if line.strip())
+        if o == "-u" or o == "--unique":
+            unique = True
+        if o == "-B" or o == "--binary-out":
+            binary_output = True
 
-    for f in input_files(args):
-        for line in f:
-            base_domain = line.strip()
-            if not base_domain:
-                continue
-            for domain in generate_domain(base_domain, random_str):
-                print(domain, file=output_file)
+    try:
+        rules = affixes(templates or TEMPLATES, random_strs or ["ZZZZ"])
+    except ValueError as e:
+        eprint(e)
+        sys.exit(2)
+
+    batches = generate_batches(base_domains(input_files(args)), rules, unique)
+    if binary_output:
+        output_file = open(output_filename, 'ab') if output_filename else sys.stdout.buffer
+        write_binary(output_file, batches)
+    else:
+        output_file = open(output_filename, 'a+') if output_filename else sys.stdout
+        write_text(output_file, batches)
     output_file.close()
@@ -2,7 +2,10 @@
 
 import sys
 import getopt
-import glob
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data"))
+import compressed
 
 def usage(f=sys.stderr):
     program = sys.argv[0]
@@ -21,19 +24,7 @@ Example:
 def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
 
-def input_files(args, binary=False):
-    STDIN =  sys.stdin.buffer if binary else sys.stdin
-    MODE = 'rb' if binary else 'r'
-    if not args:
-        yield STDIN
-    else:
-        for arg in args:
-            if arg == "-":
-                yield STDIN
-            else:
-                for path in glob.glob(arg):
-                    with open(path, MODE) as f:
-                        yield f
+input_files = compressed.input_files
 
 
 if __name__ == '__main__':